@@ -1,5 +1,7 @@
 """ Bank class
 """
+import json
+
 import numpy as np
 
 from bento import components
@@ -76,6 +78,25 @@ class Bank:
         self.callbacks = {}
         self.connectors = {}
 
+    @classmethod
+    def referenced_columns(cls, bank_dict):
+        """Collects the strings in a bank definition, a superset of the columns it uses
+
+        Banks reading columns that aren't named in their definition should extend this.
+        """
+        columns = set()
+        stack = [bank_dict]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                columns.add(item)
+            elif isinstance(item, dict):
+                stack.extend(item.keys())
+                stack.extend(item.values())
+            elif isinstance(item, (list, tuple, set)):
+                stack.extend(item)
+        return columns
+
     def create_id(self, name):
         return {"name": name, **self.uid}
 
@@ -124,8 +145,13 @@ class Bank:
         action = f"update_{target_cid.split('|')[-1]}"
         return f"{prefix}__{action}"
 
-    def add_callback(self, target_cid, cb_outputs, code):
-        """Adds callback function that can update the component of the bank"""
+    def add_callback(self, target_cid, cb_outputs, code, clientside=False):
+        """Adds callback function that can update the component of the bank
+
+        With clientside, the code is the body of a JavaScript function run in the
+        browser, for callbacks that don't need the data. Multiple outputs are
+        returned as an array, in the sorted order of the outputs.
+        """
 
         # A standard block to handle the inputs to the callback via callback_context
         input_processing = f"""
@@ -134,15 +160,28 @@ class Bank:
             inputs = dictutil.strip_prefix(dash.callback_context.inputs)
             inputs.update({self.kwargs})
         """
+        if clientside:
+            # Keys the inputs by component name, as strip_prefix and strip_attr do
+            input_processing = f"""
+            const inputs = {{}};
+            const context = dash_clientside.callback_context.inputs;
+            for (const [key, value] of Object.entries(context)) {{
+                inputs[key.split("|").pop().split(".")[0]] = value;
+            }}
+            Object.assign(inputs, {json.dumps(self.kwargs, default=str)});
+            """
         code_blocks = [input_processing, code]
 
         self.callbacks[target_cid] = {
             "provides": [val[1] for val in cb_outputs],
             "name": self.name_callback(target_cid),
-            "code": self.format_code(code_blocks),
+            "code": self.format_code(code_blocks, base_indents=2 if clientside else 1),
+            "clientside": clientside,
         }
 
-    def add_internal_callback(self, target_cid, cb_inputs, cb_outputs, code):
+    def add_internal_callback(
+        self, target_cid, cb_inputs, cb_outputs, code, clientside=False
+    ):
         """Adds a callback meant to update intra-bank components"""
 
         # Ths bit defines up front what inputs the callback takes, which we would
@@ -153,7 +192,7 @@ class Bank:
             "outputs": cb_outputs,
         }
 
-        self.add_callback(target_cid, cb_outputs, code)
+        self.add_callback(target_cid, cb_outputs, code, clientside=clientside)
 
     def format_code(self, code_blocks, base_indents=1):
         """Handle indentation of text that will be templated out to code"""
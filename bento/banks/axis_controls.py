@@ -1,4 +1,7 @@
+import json
+
 from bento import Bank
+from bento import util as butil
 from bento.common import dictutil
 
 
@@ -54,26 +57,24 @@ class axis_controls(Bank):
             args = {"options": ["linear", "log"]}
             radio = self.create_component("radio", name=f"{axis}_scale", args=args)
 
+            # The scales suited to each column are known up front, so the choice of
+            # options runs in the browser
             # TODO includes temporary multi-column support
             callback_code = f"""
-                column = dictutil.extract_unique("_column", inputs)
-
-                if isinstance(column, list):
-                    column = column[0]
-
-                col_type = data['types'].get(column, 'all')
-                options = ["linear", "log", "date"]
-                if col_type in (float, int):
-                    options = ['linear', 'log']
-                elif col_type in ('date', 'datetime'):
-                    options = ['date']
-                option_dict = butil.gen_options(options)
-                return option_dict["options"], option_dict["value"]
+                const scales = {json.dumps(self.scale_options())};
+                const field = Object.keys(inputs).find(key => /_column/.test(key));
+                let column = field === undefined ? undefined : inputs[field];
+                if (Array.isArray(column)) {{
+                    column = column[0];
+                }}
+                return scales[column] || scales[""];
             """
 
             cb_inputs = [(dropdown.uid, "value")]
             cb_outputs = [(radio.uid, "options"), (radio.uid, "value")]
-            self.add_internal_callback(radio.uid, cb_inputs, cb_outputs, callback_code)
+            self.add_internal_callback(
+                radio.uid, cb_inputs, cb_outputs, callback_code, clientside=True
+            )
 
             blocks.append([[dropdown.definition], [radio.definition]])
 
@@ -82,3 +83,17 @@ class axis_controls(Bank):
             self.blocks = blocks
 
         self.align(block_size)
+
+    def scale_options(self):
+        """Maps each column to its scale options and default, "" for any other"""
+        scales = {"": ["linear", "log", "date"]}
+        for column, col_type in self.data["types"].items():
+            if col_type in (float, int):
+                scales[column] = ["linear", "log"]
+            elif col_type in ("date", "datetime"):
+                scales[column] = ["date"]
+        scale_options = {}
+        for column, options in scales.items():
+            option_dict = butil.gen_options(options)
+            scale_options[column] = [option_dict["options"], option_dict["value"]]
+        return scale_options
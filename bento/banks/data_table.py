@@ -14,6 +14,11 @@ class data_table(Bank):
         Defines how many rows from the dataframe to access. In order to perform
         adequately, this must often be restricted to a smallish number
         (TODO figure out a reasonable estimate)
+    server_side: bool
+        Pages, sorts and filters the table on the server, sending just the rows of
+        the current page to the browser. Rows isn't needed in this mode.
+    page_size: int
+        Rows per page when server_side is on
 
     Attributes
     ----------
@@ -23,7 +28,7 @@ class data_table(Bank):
     """
 
     # @logutil.loginfo(level="debug")
-    def __init__(self, rows=1000, **kwargs):
+    def __init__(self, rows=1000, server_side=False, page_size=25, **kwargs):
         block_size = {"ideal": [8, 12], "min": [4, 6]}
         super().__init__(**kwargs)
 
@@ -41,24 +46,61 @@ class data_table(Bank):
             **{"Dropdown.multi": True},
         )
 
+        if server_side:
+            kwargs.update(
+                {
+                    "DataTable.page_action": "custom",
+                    "DataTable.sort_action": "custom",
+                    "DataTable.filter_action": "custom",
+                    "DataTable.sort_mode": "multi",
+                    "DataTable.page_current": 0,
+                    "DataTable.page_size": page_size,
+                }
+            )
         table = bc.table(id_dict=self.create_id(name="table"), label=None, **kwargs)
 
         # Columns displayed in the data table are selected here
+        if server_side:
+            callback_code = f"""
+            dropdown_cols = dictutil.extract_unique("columns", inputs)
+            page = dictutil.extract_unique("page_current", inputs) or 0
+            size = dictutil.extract_unique("page_size", inputs) or {page_size}
+            sort_by = dictutil.extract_unique("sort_by", inputs)
+            query = dictutil.extract_unique("filter_query", inputs)
+
+            # Only the rows of the current page leave the server
+            fdf = butil.sort_df(butil.query_df(sdf, query), sort_by)
+            page_count = max(1, -(-len(fdf) // size))
+            page = min(page, page_count - 1)
+            fdf = fdf.iloc[page * size : (page + 1) * size]
 
-        callback_code = f"""
+            # Only the displayed columns are serialized
+            columns = [{{"name": item, "id": item}} for item in dropdown_cols or []]
+            return [columns, butil.to_records(fdf, dropdown_cols or []), page_count]
+            """
+            table_props = ["page_current", "page_size", "sort_by", "filter_query"]
+            cb_inputs = [(dropdown.uid, "value")]
+            cb_inputs += [(table.uid, prop) for prop in table_props]
+            table_outputs = ["columns", "data", "page_count"]
+            cb_outputs = [(table.uid, prop) for prop in table_outputs]
+        else:
+            callback_code = f"""
             dropdown_cols = dictutil.extract_unique("columns", inputs)
 
             # Slice by the rows argument
             fdf = sdf[:{rows}]
 
-            columns = [{{"name": item, "id": item}} for item in dropdown_cols]
-            return [columns, fdf.to_dict('records')]
+            # Only the displayed columns are serialized
+            columns = [{{"name": item, "id": item}} for item in dropdown_cols or []]
+            return [columns, butil.to_records(fdf, dropdown_cols or [])]
             """
+            cb_inputs = [(dropdown.uid, "value")]
+            cb_outputs = [(table.uid, "columns"), (table.uid, "data")]
 
         self.add_internal_callback(
             target_cid=table.uid,
-            cb_inputs=[(dropdown.uid, "value")],
-            cb_outputs=[(table.uid, "columns"), (table.uid, "data")],
+            cb_inputs=cb_inputs,
+            cb_outputs=cb_outputs,
             code=callback_code,
         )
         self.outputs[dropdown.uid] = "value"
@@ -1,6 +1,7 @@
-import numpy as np
+import pandas as pd
 
 from bento import Bank
+from bento import util as butil
 
 
 class date_control(Bank):
@@ -38,8 +39,9 @@ class date_control(Bank):
         column = column or default
 
         # Generate the component calls
+        dates = butil.column_values(self.data, column)
         args = dict(
-            options=np.unique(self.df[column]),
+            options=dates,
             label=f"Select {column}:",
             variant=variant,
         )
@@ -53,9 +55,7 @@ class date_control(Bank):
         # Increase size to fit the date picker
         block_size = {"ideal": [2, 4], "min": [1, 3]}
 
-        args = dict(
-            options=np.unique(self.df[column].dt.to_pydatetime()), variant=variant
-        )
+        args = dict(options=pd.to_datetime(dates).to_pydatetime(), variant=variant)
         picker = self.create_component("date_picker", f"{column}_picker", args=args)
         # TODO The code creation needs a better methodology
         if self.variant == "single":
@@ -1,5 +1,8 @@
 from bento import Bank
 
+# Columns the map variants read without them being named in the descriptor
+map_columns = ("latitude", "longitude", "fips", "alpha3", "state", "county", "country")
+
 
 class graph(Bank):
     """Displays any type of graph/chart/map. A cornerstone of most Bento apps.
@@ -12,6 +15,38 @@ class graph(Bank):
     variant: string
         Each category has a set of variants supported. The default category/variant
         is represented as "normal.scatter"
+    cache: bool
+        Whether to reuse figures from the per-process figure cache for repeated
+        inputs. The cache budget is set by "figure_cache_mb" in the descriptor.
+    precision: dict
+        Decimal digits to round float arrays to, by trace attribute, to shrink the
+        figures sent, e.g. {"y": 2, "marker.color": 1}.
+    typed_arrays: bool
+        Whether to send numeric arrays as base64 binary, which plotly.js decodes
+        without parsing text (requires plotly.js 2.28 or later).
+    max_points: int
+        For "normal.scatter" graphs, the most points to send for each trace. Longer
+        traces are downsampled to this budget, keeping their peaks and troughs.
+    downsample: string -- "lttb" | "minmax"
+        How to downsample traces over max_points: Largest-Triangle-Three-Buckets,
+        or the lowest and highest points in each bucket.
+    webgl: bool
+        Whether "normal.scatter" traces render with WebGL. By default, traces with
+        more points than webgl_threshold (20000) switch to WebGL automatically.
+    simplify: bool
+        For "map.choropleth" graphs, whether to draw polygons simplified to the
+        detail visible at the initial zoom level, which are much lighter to send.
+    bins: int
+        For "normal.histogram" graphs, the number of bins. Histograms are binned on
+        the server, by bins, bin_width, or automatically if neither is given.
+    bin_width: number
+        For "normal.histogram" graphs, the width of each bin.
+    log_bins: bool
+        For "normal.histogram" graphs, whether to space the bins logarithmically.
+    binning: string -- "square" | "hex"
+        For "map.scatter" graphs, sums the points into cells of this shape, sized
+        to the zoom level, instead of drawing each location. The cells can be
+        precomputed at load with the data option "cells": "square" | "hex".
     kwargs: dict
         Passthrough of additional arguments that might get picked up at other levels
         such as the super() call.
@@ -23,7 +58,15 @@ class graph(Bank):
     --------
     """
 
-    def __init__(self, category="normal", variant="scatter", **kwargs):
+    def __init__(
+        self,
+        category="normal",
+        variant="scatter",
+        cache=True,
+        precision=None,
+        typed_arrays=False,
+        **kwargs,
+    ):
         # NOTE Can be altered to provide a better sizing for the bank
         block_size = {"ideal": [8, 12], "min": [4, 4]}
         super().__init__(**kwargs)
@@ -37,18 +80,59 @@ class graph(Bank):
         cb_code = f"""
             inputs = dictutil.strip_attr(inputs)
             component_type = f"graph.{category}.{variant}"
+
+            # This is used in conjunction with the loading overlay
+            style={{'visibility': 'visible'}}
+            """
+
+        # Changes to scales or trace styles alone restyle the figure in the browser
+        if category == "normal" and variant in ("scatter", "bar"):
+            if kwargs.get("subvariant", "normal") == "normal":
+                cb_code += """
+            if butil.presentation_only(dash.callback_context.triggered):
+                inputs = butil.apply_defaults(component_type, inputs, data)
+                filters = butil.prepare_filters(inputs)
+                return butil.restyle_patch(inputs, filters), style
+            """
+
+        # Identical selections across users and requests can share the same figure
+        if cache:
+            cb_code += f"""
+            cache_key = (
+                "{self.dataid}",
+                data["version"],
+                component_type,
+                cacheutil.freeze(inputs, unordered=["_filter"]),
+            )
+            figure = figure_cache.get(cache_key)
+            if figure is not None:
+                return figure, style
+            """
+
+        cb_code += f"""
             inputs = butil.apply_defaults(component_type, inputs, data)
             filters = butil.prepare_filters(inputs)
             transforms = butil.prepare_transforms(inputs, dep_var="{dep_var}")
             figure = Graph.{category}(sdf,
                 filters=filters,
                 transforms=transforms,
+                index=data.get("index"),
+                cube=data.get("cube"),
+                cells=data.get("cells"),
+                version=data["version"],
                 **inputs)
             figure.update_layout(classes.graph)
+            figure = butil.compact_figure(
+                figure, precision={precision!r}, typed_arrays={typed_arrays!r}
+            )
+            """
 
-            # This is used in conjunction with the loading overlay
-            style={{'visibility': 'visible'}}
+        if cache:
+            cb_code += """
+            figure_cache.put(cache_key, figure)
+            """
 
+        cb_code += """
             return figure, style
             """
 
@@ -57,3 +141,10 @@ class graph(Bank):
         cb_outputs = [(graph.uid, "figure"), (graph.uid, "style")]
         self.add_callback(graph.uid, cb_outputs, cb_code)
         self.align(block_size)
+
+    @classmethod
+    def referenced_columns(cls, bank_dict):
+        columns = super().referenced_columns(bank_dict)
+        if bank_dict.get("category") == "map":
+            columns.update(map_columns)
+        return columns
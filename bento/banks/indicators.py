@@ -36,6 +36,8 @@ class indicators(Bank):
                 sig, scale = butil.aggregate(
                     sdf,
                     filters=filters,
+                    index=data.get("index"),
+                    cube=data.get("cube"),
                     **{ind_comp['args']}
                     )
                 sig = f'{{float(f"{{sig:.3g}}"):g}}'
@@ -40,7 +40,7 @@ class ranking(Bank):
         cb_code = f"""
             inputs = dictutil.strip_attr(inputs)
             filters = butil.prepare_filters(inputs)
-            fdf = butil.filter_df(sdf, filters=filters)
+            fdf = butil.filter_df(sdf, filters=filters, index=data.get("index"))
 
             column = dictutil.extract_unique("_column", inputs)
             geo = dictutil.extract_unique("geo", inputs)
@@ -63,3 +63,8 @@ class ranking(Bank):
         cb_outputs = [(div.uid, "children")]
         self.add_callback(div.uid, cb_outputs, cb_code)
         self.align(block_size)
+
+    @classmethod
+    def referenced_columns(cls, bank_dict):
+        # The ranking key always includes fips, alongside the supplied geo
+        return super().referenced_columns(bank_dict) | {"fips"}
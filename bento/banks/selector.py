@@ -1,4 +1,6 @@
 from bento import Bank
+from bento import util as butil
+from bento.components.selection import MAX_OPTIONS
 from bento.common import logger, logutil, dictutil  # noqa
 import numpy as np
 import pandas as pd
@@ -17,6 +19,13 @@ class selector(Bank):
         Whether to include the normalization component or not
     calculus: bool
         Whether to include the calculus (rates, sums) component or not
+    search_limit: int
+        For key columns with more than MAX_OPTIONS values, the dropdown lists no
+        options up front and searches the values as the user types, showing at most
+        this many matches
+    cascade: bool
+        Whether the dropdowns of several key columns list only the values found
+        alongside the selections made in the others
 
     Attributes
     ----------
@@ -26,22 +35,23 @@ class selector(Bank):
     """
 
     # @logutil.loginfo(level="debug")
-    def __init__(self, columns=(), **kwargs):
+    def __init__(self, columns=(), search_limit=50, cascade=True, **kwargs):
         # NOTE Can be altered to provide a better sizing for the bank
         block_size = {"ideal": [2, 3], "min": [1, 2]}
         super().__init__(**kwargs)
 
         columns = columns or self.data["keys"]
 
+        dropdowns = {}
         for col in columns:
             option_args = dictutil.extract_path(f"{col}.", kwargs)
-            option_vals = pd.Series(sorted(self.df[col].unique()))
+            option_vals = pd.Series(butil.column_values(self.data, col))
             options_numeric = np.issubdtype(option_vals, np.number)
             options = {
                 "options": list(option_vals),
                 "default": [],
                 "overflow": f"""
-                    list(_global_data["{self.dataid}"]["df"]["{col}"].unique())""",
+                    list(butil.column_values(_global_data["{self.dataid}"], "{col}"))""",
                 **option_args,
             }
 
@@ -60,8 +70,41 @@ class selector(Bank):
                 comp_type = "slider"
                 options = option_vals
                 args["variant"] = "range"
+            # Too many values to list, so they're looked up as the user types
+            searchable = comp_type == "dropdown" and col in self.data.get("search", {})
+            if searchable and len(options["options"]) > MAX_OPTIONS:
+                options = {**options, "options": []}
+                options.pop("overflow")
+            else:
+                searchable = False
             args["options"] = options
-            self.create_component(comp_type, name=f"{col}_filter", args=args)
+            comp = self.create_component(comp_type, name=f"{col}_filter", args=args)
+            if comp_type == "dropdown":
+                dropdowns[col] = (comp, searchable)
+
+        # Dropdowns on two or more key columns narrow each other's options
+        combos = self.data.get("combos") or {}
+        cascading = [col for col in dropdowns if col in combos.get("columns", [])]
+        if not cascade or len(cascading) < 2:
+            cascading = []
+        for col, (comp, searchable) in dropdowns.items():
+            if not searchable and col not in cascading:
+                continue
+            cb_inputs = [(comp.uid, "value")]
+            if searchable:
+                cb_inputs.append((comp.uid, "search_value"))
+            others = [dropdowns[other][0] for other in cascading if other != col]
+            cb_inputs += [(other.uid, "value") for other in others]
+            limit = search_limit if searchable else None
+            callback_code = f"""
+                return butil.selection_options(data, "{col}", inputs, limit={limit})
+                """
+            self.add_internal_callback(
+                target_cid=comp.uid,
+                cb_inputs=cb_inputs,
+                cb_outputs=[(comp.uid, "options")],
+                code=callback_code,
+            )
 
         self.align(block_size)
 
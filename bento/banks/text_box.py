@@ -1,3 +1,5 @@
+import json
+
 from bento import Bank
 from bento.common import logger, logutil, dictutil  # noqa
 
@@ -44,13 +46,16 @@ class text_box(Bank):
         elif isinstance(text, dict):
             default = text.get("default", "<default>")
             args["children"] = default
+            # The lookup needs no data, so it runs in the browser
             cb_code = f"""
-                field = dictutil.extract_unique("{cb_field}", inputs)
-                text = {text}
-                return text.get(field, "{default}")
+                const texts = {json.dumps(text)};
+                const field = Object.keys(inputs).find(key => /{cb_field}/.test(key));
+                const value = field === undefined ? undefined : inputs[field];
+                const known = Object.prototype.hasOwnProperty.call(texts, value);
+                return known ? texts[value] : {json.dumps(default)};
             """
             div = self.create_component("div", name="text", args=args)
             cb_outputs = [(div.uid, "children")]
-            self.add_callback(div.uid, cb_outputs, cb_code)
+            self.add_callback(div.uid, cb_outputs, cb_code, clientside=True)
 
         self.align(block_size)
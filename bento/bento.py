@@ -3,14 +3,13 @@
 import black
 import cerberus
 import copy
-import importlib
 import pathlib
 import re
 from typing import Dict, List
 from jinja2 import Environment, PackageLoader
 
 from bento import util as butil
-from bento import banks, grid, schema, style
+from bento import banks, datastore, grid, schema, style
 
 from bento.common import logger, logutil, dictutil, codeutil  # noqa
 
@@ -28,6 +27,10 @@ class Bento:
     init_only : bool
         Supply True in order to halt the automatic processing of the descriptor. This
         can be useful for debugging or modifying the standard app-creation process.
+    share_data : bool
+        Supply True to hand the loaded data over to the generated app, when it will be
+        imported in the same process (e.g. by the launcher). The app then skips loading
+        the data a second time.
 
     Attributes
     ----------
@@ -57,7 +60,9 @@ class Bento:
 
     """
 
-    def __init__(self, descriptor: Dict, init_only: bool = False):
+    def __init__(
+        self, descriptor: Dict, init_only: bool = False, share_data: bool = False
+    ):
         # TODO Allow easy overriding of templates
         self.app_template = "bento_v1.py.j2"
         self.baseline_template = "baseline.css.j2"
@@ -74,7 +79,7 @@ class Bento:
         self.desc = self.normalize(descriptor)
 
         # Loads the input data to inform components to the columns, types, etc
-        self.data = self.process_data(self.desc)
+        self.data = self.process_data(self.desc, share=share_data)
 
         # Generates the initial context object
         self.init_structure()
@@ -185,23 +190,29 @@ class Bento:
 
             # Make space for the bank class instances
             page["banks"] = {}
+
+        # Datasets can opt in to parsing only the columns their banks reference
+        for dataid, data in desc["data"].items():
+            if data.pop("prune", False):
+                usecols = self.referenced_columns(desc, dataid)
+                data["args"]["usecols"] = sorted(usecols)
         logging.info("#$+ done")
         return desc
 
-    def process_data(self, descriptor: Dict) -> Dict:
+    def referenced_columns(self, desc: Dict, dataid: str) -> set:
+        """Gathers the candidate column names used by all banks on a dataset"""
+        columns = set()
+        for page in desc["pages"].values():
+            for bank in page["bank_dicts"].values():
+                bank_class = banks._bank_map.get(bank.get("type"))
+                if bank["dataid"] != dataid or not bank_class:
+                    continue
+                columns |= bank_class.referenced_columns(bank)
+        return columns
+
+    def process_data(self, descriptor: Dict, share: bool = False) -> Dict:
         logging.info("Loading the dataframes specified:")
-        data = {}
-        for dataid, entry in descriptor["data"].items():
-            logging.info(f"  {dataid}:")
-            try:
-                data_module = importlib.import_module(entry["module"])
-            except ImportError:
-                logging.warning(f"Failed to load {entry['module']}")
-                continue
-            data[dataid] = getattr(data_module, entry["call"])(**entry["args"])
-            data[dataid]["columns"] = list(data[dataid]["types"].keys())
-            logging.info(f"    Loaded Dataframe of shape {data[dataid]['df'].shape}")
-        return data
+        return datastore.load_all(descriptor["data"], share=share)
 
     def init_structure(self):
         logging.info("#^Generating initial context object...")
@@ -244,6 +255,7 @@ class Bento:
             "theme_spec": self._theme_spec,
             "appbar": self.desc.get("appbar", {}),
             "show_help": self.desc.get("show_help", False),
+            "figure_cache_mb": self.desc.get("figure_cache_mb", 64),
             "data": self.desc["data"],
             "pages": {},
             "banks": {},
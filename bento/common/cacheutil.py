@@ -0,0 +1,121 @@
+"""Caching utilities for results that are expensive to compute but safe to reuse"""
+import collections
+import sys
+import threading
+
+from bento.common import logger
+
+logging = logger.fancy_logger(__name__)
+
+
+def sizeof(obj):
+    """Estimates the memory held by nested containers of arrays and scalars"""
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if hasattr(item, "nbytes"):
+            total += item.nbytes
+        elif isinstance(item, dict):
+            total += sys.getsizeof(item)
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            total += sys.getsizeof(item)
+            stack.extend(item)
+        elif hasattr(item, "to_plotly_json"):
+            stack.append(item.to_plotly_json())
+        else:
+            total += sys.getsizeof(item)
+    return total
+
+
+def freeze(inputs, unordered=()):
+    """Canonicalizes a dict of inputs into a hashable key
+
+    Lists under keys matching any of the `unordered` suffixes are sorted, as their
+    order doesn't change the result (e.g. the values selected in a multi-dropdown).
+    """
+    items = []
+    for key, value in sorted(inputs.items()):
+        if isinstance(value, list) and key.endswith(tuple(unordered)):
+            value = sorted(value, key=repr)
+        items.append((key, repr(value)))
+    return tuple(items)
+
+
+class LRUCache:
+    """A thread-safe, least-recently-used cache bounded by the total size of entries
+
+    Initialization Parameters
+    -------------------------
+    max_bytes: int
+        The budget for the summed size of the cached values. The least recently used
+        entries are evicted to stay within it.
+    sizer: function
+        Estimates the size in bytes of a value, defaulting to `sizeof`
+
+    Attributes
+    ----------
+    hits: int
+    misses: int
+    evictions: int
+    nbytes: int
+        The current summed size of the cached values
+    """
+
+    def __init__(self, max_bytes=64 * 2 ** 20, sizer=sizeof):
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value):
+        nbytes = self.sizer(value)
+        if nbytes > self.max_bytes:
+            logging.debug(f"Not caching a value of {nbytes} bytes, beyond the budget")
+            return
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+            self._items[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._items.popitem(last=False)
+                self.nbytes -= evicted_bytes
+                self.evictions += 1
+
+    def discard(self, predicate):
+        """Drops every entry whose key satisfies the predicate"""
+        with self._lock:
+            for key in [key for key in self._items if predicate(key)]:
+                self.nbytes -= self._items.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._items),
+            "nbytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
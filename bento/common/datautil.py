@@ -1,5 +1,10 @@
 """This is a collection of utilities related to loading data from file
 """
+import contextlib
+import functools
+import hashlib
+import numpy as np
+import os
 import pandas as pd
 import pathlib
 import pkgutil
@@ -9,6 +14,12 @@ from bento.common import util, logger
 
 logging = logger.fancy_logger(__name__)
 
+# Feather is used for the binary sidecar cache of parsed CSVs, if pyarrow is available
+try:
+    from pyarrow import feather
+except ImportError:
+    feather = None
+
 
 def clean_string_name(item):
     return item.strip().replace("*,()", "")
@@ -30,26 +41,448 @@ def fuzzy_search(name, corpus, clean=clean_string_name):
     return output
 
 
-def df_loader(filename, package="bento", parse_dates=None, location="."):
+# Parsed CSVs are cached per user, as package assets may not be writable
+cache_location = util.cache_dir("csv")
+
+
+def _cache_path(cache_dir, csv_path, args):
+    """Names the sidecar for a CSV, keyed on its identity and the parse arguments
+
+    The name starts with the file and its current state, so sidecars of an older
+    version of the file can be found and removed.
+    """
+    csv_path = csv_path.resolve()
+    stat = csv_path.stat()
+    source = hashlib.sha1(str(csv_path).encode()).hexdigest()[:8]
+    state = hashlib.sha1(repr([stat.st_mtime_ns, stat.st_size]).encode()).hexdigest()
+    parse = hashlib.sha1(repr(sorted(args.items())).encode()).hexdigest()
+    name = f"{csv_path.stem}.{source}.{state[:8]}.{parse[:8]}"
+    return pathlib.Path(cache_dir, f"{name}.feather")
+
+
+def _read_cache(cache_path):
+    try:
+        # Memory-mapping lets the OS page in columns rather than copying the file
+        df = feather.read_feather(str(cache_path), memory_map=True)
+        logging.debug(f"Loaded cached {cache_path}")
+        return df
+    except Exception:
+        logging.debug(f"Unable to read cache {cache_path}")
+
+
+def _write_cache(df, cache_path):
+    # Write under a unique name and rename, as workers may race to create the cache
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        feather.write_feather(df, str(tmp_path), compression="uncompressed")
+        os.replace(tmp_path, cache_path)
+    except Exception as exc:
+        logging.debug(f"Unable to write cache {cache_path}: {exc}")
+        with contextlib.suppress(OSError):
+            tmp_path.unlink()
+        return
+
+    # Sidecars of an older version of the CSV are no longer useful, while those of
+    # other parse arguments may still be in use
+    source, state = cache_path.name.split(".")[-4:-2]
+    stem = cache_path.name.rsplit(".", 4)[0]
+    for stale in cache_path.parent.glob(f"{stem}.{source}.*.feather"):
+        if stale.name.split(".")[-3] != state:
+            with contextlib.suppress(OSError):
+                stale.unlink()
+
+
+def schema_args(keys=(), types=None, usecols=None, **kwargs):
+    """Translates a loader's declared keys and types into df_loader arguments
+
+    Keys are parsed directly as categoricals and declared floats skip inference. Ints
+    are left to inference, as missing values would otherwise fail the parse. Any
+    requested usecols are extended to always include the declared columns.
+    """
+    types = types or {}
+    dtype = {key: "category" for key in keys}
+    dtype.update({col: "float64" for col, ctype in types.items() if ctype is float})
+    if usecols:
+        usecols = [*keys, *types, *usecols]
+    return {"dtype": dtype, "usecols": usecols, **kwargs}
+
+
+def _parser_args(csv_path, args):
+    """Restricts the parse arguments to the columns actually present in the file"""
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    usecols = args["usecols"]
+    if usecols:
+        usecols = [col for col in header if col in usecols]
+    present = usecols or header
+    parse_dates = [col for col in args["parse_dates"] if col in present]
+    parser_args = {
+        "parse_dates": parse_dates,
+        "dtype": {
+            col: dtype
+            for col, dtype in args["dtype"].items()
+            if col in present and col not in parse_dates
+        },
+        "usecols": usecols,
+    }
+    if args["engine"]:
+        parser_args["engine"] = args["engine"]
+    # The pyarrow engine infers datetime formats on its own
+    if args["engine"] != "pyarrow":
+        parser_args["infer_datetime_format"] = True
+    return parser_args
+
+
+def df_loader(
+    filename,
+    package="bento",
+    parse_dates=None,
+    location=".",
+    dtype=None,
+    usecols=None,
+    engine=None,
+    cache=True,
+    cache_dir=None,
+):
+    """Loads a CSV into a DataFrame, preferring a local override over package assets
+
+    The dtype, usecols and engine arguments are handed to the parser, after dropping
+    any columns not present in the file. When pyarrow is available and cache is True,
+    the parsed frame is also stored as a Feather sidecar in the per-user cache, or in
+    cache_dir if given. Later loads of an unchanged file with the same arguments read
+    the sidecar instead of parsing the text again.
+    """
     args = {
-        "parse_dates": parse_dates or [],
-        "infer_datetime_format": True,
+        "parse_dates": list(parse_dates or []),
+        "dtype": dict(sorted((dtype or {}).items())),
+        "usecols": sorted(usecols) if usecols else None,
+        "engine": engine,
     }
     # First try locally for an override file, then check assets
     init_py_path = pkgutil.get_loader(package).path
     package_path = pathlib.Path(init_py_path).parent
     location_list = [location, "assets", f"{package_path}/assets"]
     for loc in location_list:
+        logging.debug(f"Searching for {filename} at {loc}")
+        csv_path = pathlib.Path(f"{loc}/{filename}")
+        if not csv_path.is_file():
+            continue
+
+        cache_path = None
+        if cache and feather:
+            cache_path = _cache_path(cache_dir or cache_location, csv_path, args)
+            if cache_path.is_file():
+                df = _read_cache(cache_path)
+                if df is not None:
+                    return df
+
         try:
-            logging.debug(f"Searching for {filename} at {loc}")
-            df = pd.read_csv(f"{loc}/{filename}", **args)
-            return df
+            df = pd.read_csv(csv_path, **_parser_args(csv_path, args))
         except FileNotFoundError:
-            pass
+            continue
+
+        if cache_path:
+            _write_cache(df, cache_path)
+        return df
 
     logging.warning(f"Unable to load {filename} from any of {location_list}")
 
 
+def _downcast(series):
+    """Narrows a numeric series to the smallest dtype holding its values exactly"""
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+        narrow = series.astype(np.float32)
+        if np.array_equal(narrow.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+            return narrow
+    return series
+
+
+def compact(data):
+    """Shrinks the DataFrame of a loaded dataset in place, returning the bytes saved
+
+    Key columns are dictionary-encoded as categoricals, so filters compare integer
+    codes, and numeric measures are downcast where no precision is lost.
+    """
+    idf = data["df"]
+    before = idf.memory_usage(deep=True).sum()
+    columns = {}
+    for col in idf.columns:
+        series = idf[col]
+        if col in data.get("keys", []):
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype("category")
+        elif pd.api.types.is_numeric_dtype(series):
+            series = _downcast(series)
+        columns[col] = series
+    data["df"] = pd.DataFrame(columns, index=idf.index)
+    return int(before - data["df"].memory_usage(deep=True).sum())
+
+
+def build_index(idf, columns):
+    """Maps each distinct value of the columns to the sorted row positions holding it"""
+    dtype = np.int32 if len(idf) < 2 ** 31 else np.int64
+    index = {}
+    for col in columns:
+        if col not in idf.columns:
+            continue
+        groups = idf.groupby(col, observed=True, sort=False).indices
+        index[col] = {value: rows.astype(dtype) for value, rows in groups.items()}
+    return index
+
+
+def build_cube(idf, keys, date="date"):
+    """Pre-aggregates the numeric columns by date, alone and with each key column
+
+    Only non-numeric keys get a slice, since the sum of a numeric key is itself kept
+    as a measure when grouping by the others.
+    """
+    if date not in idf.columns:
+        return None
+    by = {}
+    for col in keys:
+        if col not in idf.columns or pd.api.types.is_numeric_dtype(idf[col]):
+            continue
+        grouped = idf.groupby([date, col], observed=True)
+        by[col] = grouped.sum(numeric_only=True).reset_index()
+    totals = idf.groupby([date], observed=True).sum(numeric_only=True).reset_index()
+    return {"date": date, "totals": totals, "by": by}
+
+
+def _world_pixels(lat, lon):
+    """Projects coordinates to Web Mercator pixels of a zoom 0 (256px) map"""
+    lat = np.radians(np.clip(np.asarray(lat, dtype="float64"), -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype="float64") + 180) / 360 * 256
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * 256
+    return x, y
+
+
+def _world_coords(x, y):
+    lon = x / 256 * 360 - 180
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / 256))))
+    return lat, lon
+
+
+def _cell_codes(col, row):
+    """Numbers the distinct (col, row) integer cells, returning codes and the cells"""
+    col, row = col.astype(np.int64), row.astype(np.int64)
+    if not len(col):
+        return np.zeros(0, dtype=np.int64), col, row
+    col_min, row_min = col.min(), row.min()
+    span = row.max() - row_min + 1
+    keys = (col - col_min) * span + (row - row_min)
+    uniq, codes = np.unique(keys, return_inverse=True)
+    return codes, uniq // span + col_min, uniq % span + row_min
+
+
+def bin_points(lat, lon, zoom, shape="square", cell_px=16):
+    """Assigns points to square or hex cells about cell_px across at a map zoom
+
+    Returns the cell code of each point and the latitude and longitude of each cell
+    center, with codes numbering the occupied cells from zero. Points missing a
+    coordinate share a final cell with no center.
+    """
+    x, y = _world_pixels(lat, lon)
+    scale = 2 ** zoom / cell_px
+    x, y = x * scale, y * scale
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    if shape == "hex":
+        # Axial coordinates of pointy-top hexagons, rounded through cube coordinates
+        size = 0.5
+        q = (np.sqrt(3) / 3 * x - y / 3) / size
+        r = (2 / 3 * y) / size
+        rq, rr, rs = np.round(q), np.round(r), np.round(-q - r)
+        dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs + q + r)
+        fix_q = (dq > dr) & (dq > ds)
+        fix_r = ~fix_q & (dr > ds)
+        rq = np.where(fix_q, -rr - rs, rq)
+        rr = np.where(fix_r, -rq - rs, rr)
+        codes, cell_q, cell_r = _cell_codes(rq, rr)
+        cx = size * np.sqrt(3) * (cell_q + cell_r / 2)
+        cy = size * 1.5 * cell_r
+    else:
+        codes, cell_x, cell_y = _cell_codes(np.floor(x), np.floor(y))
+        cx, cy = cell_x + 0.5, cell_y + 0.5
+    center_lat, center_lon = _world_coords(cx / scale, cy / scale)
+
+    if not valid.all():
+        all_codes = np.full(len(valid), len(center_lat), dtype=np.int64)
+        all_codes[valid] = codes
+        codes = all_codes
+        center_lat = np.append(center_lat, np.nan)
+        center_lon = np.append(center_lon, np.nan)
+    dtype = np.int32 if len(center_lat) < 2 ** 31 else np.int64
+    return codes.astype(dtype), center_lat, center_lon
+
+
+def build_cells(idf, shape="square", zooms=range(0, 13), cell_px=16):
+    """Precomputes the map cell of every row at each zoom level
+
+    Lets binned map scatters aggregate with a bincount over the filtered rows, rather
+    than projecting and grouping the coordinates on every callback.
+    """
+    if not {"latitude", "longitude"} <= set(idf.columns):
+        return None
+    cells = {"shape": shape, "cell_px": cell_px, "zooms": {}}
+    for zoom in zooms:
+        cells["zooms"][zoom] = bin_points(
+            idf["latitude"], idf["longitude"], zoom, shape=shape, cell_px=cell_px
+        )
+    return cells
+
+
+def _search_text(value):
+    """The lowercase form of an option label that searches are matched against"""
+    return str(value).strip().replace("_", " ").lower()
+
+
+def build_search(idf, columns):
+    """Prepares the distinct values of text columns for searching as the user types
+
+    Values are sorted by their lowercase label, so prefixes are found by bisection,
+    and each label's trigrams point back to its position for substring matches.
+    """
+    search = {}
+    for col in columns:
+        if col not in idf.columns or pd.api.types.is_numeric_dtype(idf[col]):
+            continue
+        values = pd.unique(idf[col].dropna())
+        texts = np.array([_search_text(value) for value in values])
+        order = np.argsort(texts, kind="stable")
+        texts = texts[order]
+        grams = {}
+        for pos, text in enumerate(texts):
+            for gram in {text[i : i + 3] for i in range(len(text) - 2)}:
+                grams.setdefault(gram, []).append(pos)
+        search[col] = {
+            "values": [values[idx] for idx in order],
+            "texts": texts,
+            "grams": {key: np.array(pos, dtype=np.int32) for key, pos in grams.items()},
+        }
+    return search
+
+
+def search(index, text, limit=50):
+    """Finds up to limit values whose label starts with, then contains, the text"""
+    text = _search_text(text or "")
+    texts = index["texts"]
+    start = np.searchsorted(texts, text, side="left")
+    stop = np.searchsorted(texts, text + "\uffff", side="left")
+    found = list(range(start, min(stop, start + limit)))
+
+    if len(found) < limit and len(text) >= 3:
+        # Candidates share every trigram of the text, and are then checked in full
+        rows = [index["grams"].get(text[i : i + 3]) for i in range(len(text) - 2)]
+        if all(row is not None for row in rows):
+            candidates = functools.reduce(np.intersect1d, rows)
+            candidates = candidates[(candidates < start) | (candidates >= stop)]
+            for pos in candidates:
+                if text in texts[pos]:
+                    found.append(pos)
+                    if len(found) == limit:
+                        break
+    return [index["values"][pos] for pos in found]
+
+
+def search_values(values, text, limit=50):
+    """Like search, but over a short list of values rather than a prebuilt index"""
+    text = _search_text(text or "")
+    texts = [_search_text(value) for value in values]
+    prefixed = [val for val, item in zip(values, texts) if item.startswith(text)]
+    within = [
+        val
+        for val, item in zip(values, texts)
+        if text in item and not item.startswith(text)
+    ]
+    return (prefixed + within)[:limit]
+
+
+def build_combos(idf, keys):
+    """Finds the distinct combinations of the text key columns, as integer codes
+
+    A selection on some keys can then narrow the values of the others by looking
+    through the combinations, which are far fewer than the rows.
+    """
+    columns = [
+        col
+        for col in keys
+        if col in idf.columns and not pd.api.types.is_numeric_dtype(idf[col])
+    ]
+    if len(columns) < 2:
+        return None
+    codes, labels = {}, {}
+    for col in columns:
+        codes[col], labels[col] = pd.factorize(idf[col], sort=True)
+    combos = pd.DataFrame(codes).drop_duplicates().to_numpy()
+    dtype = np.int32 if len(idf) < 2 ** 31 else np.int64
+    return {"columns": columns, "codes": combos.astype(dtype), "labels": labels}
+
+
+def cooccurring(combos, column, selections):
+    """Values of a key column found alongside the selections made on the other keys
+
+    Returns None when no other key has a selection, so nothing is narrowed.
+    """
+    columns = combos["columns"]
+    mask = None
+    for other, values in selections.items():
+        if other == column or other not in columns or not values:
+            continue
+        values = values if isinstance(values, list) else [values]
+        picked = combos["labels"][other].get_indexer(values)
+        hits = np.isin(combos["codes"][:, columns.index(other)], picked[picked >= 0])
+        mask = hits if mask is None else mask & hits
+    if mask is None:
+        return None
+    codes = np.unique(combos["codes"][mask, columns.index(column)])
+    return list(combos["labels"][column][codes[codes >= 0]])
+
+
+def column_stats(series, max_values=10000, quantiles=(0.25, 0.5, 0.75)):
+    """Summarizes a column by its dtype, null and distinct counts, and range
+
+    The sorted distinct values are kept if there are at most max_values of them, and
+    numeric columns also get their quantiles.
+    """
+    nulls = int(series.isna().sum())
+    stats = {"dtype": str(series.dtype), "count": len(series) - nulls, "nulls": nulls}
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Categories seen in the codes, so unused ones left by a filter drop out
+        seen = np.bincount(series.cat.codes.to_numpy() + 1)[1:].nonzero()[0]
+        values = series.cat.categories[seen].to_numpy()
+    else:
+        values = pd.unique(series.dropna())
+    stats["distinct"] = len(values)
+
+    try:
+        if len(values) <= max_values:
+            values = np.sort(values)
+            low, high = (values[0], values[-1]) if len(values) else (None, None)
+        else:
+            values = None
+            low, high = series.min(), series.max()
+    except TypeError:
+        # Mixed types have no order
+        values, low, high = None, None, None
+    stats.update({"values": values, "min": low, "max": high, "quantiles": None})
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        numbers = series.to_numpy(dtype=float, na_value=np.nan)
+        if stats["count"]:
+            levels = np.nanquantile(numbers, quantiles)
+            stats["quantiles"] = dict(zip(quantiles, levels.tolist()))
+    return stats
+
+
+def build_stats(idf, max_values=10000):
+    """Catalogs the statistics of every column, so banks needn't scan them again"""
+    return {col: column_stats(idf[col], max_values=max_values) for col in idf.columns}
+
+
 def autostructure(idf, mods=None):
     dates = [key for key, val in dict(idf.dtypes).items() if "date" in val.__str__()]
     keys = [key for key, val in dict(idf.dtypes).items() if val.__str__() == "object"]
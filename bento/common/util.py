@@ -1,3 +1,5 @@
+import os
+import pathlib
 import re
 import subprocess
 
@@ -10,6 +12,12 @@ def id_func(x):
     return x
 
 
+def cache_dir(*parts):
+    """A directory under the per-user cache for Bento, e.g. ~/.cache/bento/csv"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+    return pathlib.Path(cache_home, "bento", *parts)
+
+
 def desnake(text):
     """Turns underscores into spaces"""
     return text.strip().replace("_", " ")
@@ -13,18 +13,19 @@ MAX_OPTIONS = 100
 
 class date_picker(Component):
     def __init__(self, options, variant="single", **kwargs):
+        low, high = options.min(), options.max()
         args = {
-            "min_date_allowed": options.min(),
-            "max_date_allowed": options.max(),
-            "initial_visible_month": options.max(),
+            "min_date_allowed": low,
+            "max_date_allowed": high,
+            "initial_visible_month": high,
         }
         if variant == "single":
             component = "DatePickerSingle"
-            args["date"] = options.max()
+            args["date"] = high
         elif variant == "range":
             component = "DatePickerRange"
-            args["start_date"] = options.min()
-            args["end_date"] = options.max()
+            args["start_date"] = low
+            args["end_date"] = high
         super().__init__("dcc", component, args, **kwargs)
 
 
@@ -52,11 +53,8 @@ class radio(Component):
 
 class slider(Component):
     def __init__(self, options, variant="single", marks=False, **kwargs):
-        args = {
-            "value": kwargs.get("value") or options.min(),
-            "min": options.min(),
-            "max": options.max(),
-        }
+        low, high = options.min(), options.max()
+        args = {"value": kwargs.get("value") or low, "min": low, "max": high}
         if marks:
             args["marks"] = butil.gen_marks(options, variant)
             args["step"] = None
@@ -64,6 +62,6 @@ class slider(Component):
         if variant == "single":
             component = "Slider"
         elif variant == "range":
-            args["value"] = [options.min(), options.max()]
+            args["value"] = [low, high]
             component = "RangeSlider"
         super().__init__("dcc", component, args, **kwargs)
@@ -143,7 +143,7 @@ def serve():
     import sys
     from bento.bento import Bento
 
-    Bento(descriptor).write()
+    Bento(descriptor, share_data=True).write()
     sys.path.append(".")
 
     from bento_app import app  # noqa
@@ -0,0 +1,221 @@
+"""Loads the datasets named in a descriptor, for both the builder and generated app
+
+When the generated app is imported into the same process that built it (as with the
+launcher), the builder can share its loaded datasets so they are not loaded twice.
+Within the app, datasets live in a DataStore, which can reload them while running.
+"""
+import collections.abc
+import concurrent.futures
+import contextlib
+import importlib
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List
+
+from bento.common import logger, datautil
+
+logging = logger.fancy_logger(__name__)
+
+# Datasets handed over by a build, keyed by dataid, awaiting pickup by the app
+_shared = {}
+
+# Each load is stamped with a new version, so results derived from it can be keyed
+_versions = itertools.count(1)
+
+
+def _signature(entry: Dict) -> str:
+    """Identifies an entry by everything that affects the data it loads"""
+    return repr(sorted(entry.items()))
+
+
+def load(dataid: str, entry: Dict) -> Dict:
+    """Calls the data module for an entry, returning None if it can't be imported"""
+    try:
+        data_module = importlib.import_module(entry["module"])
+    except ImportError:
+        logging.warning(f"Failed to load {entry['module']}")
+        return None
+    data = getattr(data_module, entry["call"])(**entry["args"])
+    data["columns"] = list(data["types"].keys())
+    data["version"] = next(_versions)
+    if entry.get("compact"):
+        saved = datautil.compact(data)
+        logging.info(f"  {dataid}: compacted, saving {saved / 2**20:.1f} MiB")
+    # Column ranges and distinct values, read by the banks instead of scanning
+    if entry.get("stats", True):
+        data["stats"] = datautil.build_stats(data["df"])
+    # Row positions by key value let filters gather rows instead of scanning
+    if entry.get("index", True):
+        data["index"] = datautil.build_index(data["df"], data.get("keys", []))
+    # Searchable key values let dropdowns with many options load them as the user types
+    if entry.get("search", True):
+        data["search"] = datautil.build_search(data["df"], data.get("keys", []))
+    # Key combinations let selectors narrow each other's options without a scan
+    if entry.get("combos", True):
+        data["combos"] = datautil.build_combos(data["df"], data.get("keys", []))
+    # Sums by date and key can answer the common aggregations without a groupby
+    if entry.get("cube"):
+        data["cube"] = datautil.build_cube(data["df"], data.get("keys", []))
+    # Map cells per zoom level let binned map scatters skip projecting coordinates
+    if entry.get("cells"):
+        data["cells"] = datautil.build_cells(data["df"], shape=entry["cells"])
+    return data
+
+
+def _timed_load(dataid: str, entry: Dict):
+    start = time.perf_counter()
+    try:
+        data = load(dataid, entry)
+    except Exception as exc:
+        # One failing dataset shouldn't prevent the others from loading
+        logging.warning(f"  {dataid}: failed with {type(exc).__name__}: {exc}")
+        return None
+    if data is not None:
+        elapsed = time.perf_counter() - start
+        logging.info(f"  {dataid}: {data['df'].shape} in {elapsed:.2f}s")
+    return data
+
+
+def load_all(entries: Dict, share: bool = False, workers: int = None) -> Dict:
+    """Loads every dataset entry concurrently, optionally sharing them with the app
+
+    Loads run in a thread pool, as the parsers release the GIL for the bulk of their
+    work and threads avoid copying the frames back from other processes. Datasets
+    that fail to load are logged and left out.
+    """
+    if not entries:
+        return {}
+    workers = workers or len(entries)
+    data = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            dataid: pool.submit(_timed_load, dataid, entry)
+            for dataid, entry in entries.items()
+        }
+        for dataid, future in futures.items():
+            loaded = future.result()
+            if loaded is None:
+                continue
+            data[dataid] = loaded
+            if share:
+                _shared[dataid] = (_signature(entries[dataid]), loaded)
+    return data
+
+
+class RWLock:
+    """A lock allowing many concurrent readers, or a single writer"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextlib.contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self._cond:
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class DataStore(collections.abc.Mapping):
+    """Holds the datasets of a running app, swapping in reloaded versions atomically
+
+    Each dataset is a dict that is never modified once loaded. A reload builds the
+    replacement (with its index, cube, etc) off to the side and then swaps it in, so
+    a callback holding a dataset keeps a consistent snapshot until it finishes.
+
+    Initialization Parameters
+    -------------------------
+    entries: dict
+        The normalized "data" section of the descriptor, used to reload
+    data: dict
+        The datasets already loaded, keyed by dataid
+    """
+
+    def __init__(self, entries: Dict, data: Dict):
+        self.entries = entries
+        self._data = dict(data)
+        self._lock = RWLock()
+        self._listeners = []
+
+    def __getitem__(self, dataid):
+        with self._lock.read():
+            return self._data[dataid]
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __len__(self):
+        return len(self._data)
+
+    def snapshot(self) -> Dict:
+        """Provides all current datasets at once, consistent with each other"""
+        with self._lock.read():
+            return dict(self._data)
+
+    def on_swap(self, listener: Callable[[List], None]):
+        """Registers a function to call with the dataids after each swap"""
+        self._listeners.append(listener)
+
+    def reload(self, dataids: List = None) -> List:
+        """Loads fresh copies of the datasets, then swaps them all in together"""
+        dataids = dataids or list(self.entries)
+        fresh = load_all({dataid: self.entries[dataid] for dataid in dataids})
+        if not fresh:
+            return []
+        with self._lock.write():
+            self._data.update(fresh)
+        for listener in self._listeners:
+            listener(list(fresh))
+        return list(fresh)
+
+    def schedule(self, dataid: str, interval: float) -> threading.Thread:
+        """Reloads a dataset every interval seconds in a background thread"""
+
+        def refresh():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload([dataid])
+                except Exception as exc:
+                    logging.warning(f"Reloading {dataid} failed: {exc}")
+
+        thread = threading.Thread(target=refresh, name=f"reload_{dataid}", daemon=True)
+        thread.start()
+        return thread
+
+
+def fetch(entries: Dict) -> DataStore:
+    """Takes over any matching datasets shared by a build, loading the remainder"""
+    data, remaining = {}, {}
+    for dataid, entry in entries.items():
+        signature, shared = _shared.pop(dataid, (None, None))
+        if signature == _signature(entry):
+            logging.info(f"  {dataid}: reusing the data loaded by the build")
+            data[dataid] = shared
+        else:
+            remaining[dataid] = entry
+    data.update(load_all(remaining))
+    return DataStore(entries, data)
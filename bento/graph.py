@@ -6,11 +6,15 @@ import numpy as np
 import plotly.graph_objects as go
 
 from bento import util as butil
-from bento.resources import geojson
-from bento.common import logger, dictutil  # noqa
+from bento import resources
+from bento.common import logger, dictutil, cacheutil  # noqa
 
 logging = logger.fancy_logger(__name__)
 
+# Histogram bin edges by data version and filter state, as the automatic rules scan
+# the values in full
+edge_cache = cacheutil.LRUCache(max_bytes=2 ** 20)
+
 
 class Graph:
     @classmethod
@@ -37,6 +41,16 @@ class Graph:
         keys=None,
         filters={},
         transforms=[],
+        index=None,
+        cube=None,
+        max_points=None,
+        downsample="lttb",
+        webgl=None,
+        webgl_threshold=20000,
+        bins=None,
+        bin_width=None,
+        log_bins=False,
+        version=None,
         **kwargs,
     ):
 
@@ -52,10 +66,13 @@ class Graph:
         key_columns = keys or ["date"]
 
         graph_call = getattr(go, variant.title())
+        # Histograms are binned here and drawn as bars, sending counts not values
+        if variant == "histogram":
+            graph_call = go.Bar
 
         fig = go.Figure()
         if variant in ("pie"):
-            fdf = butil.filter_df(idf, filters)
+            fdf = butil.filter_df(idf, filters, index=index)
             default_settings = {}
             data_settings = {
                 "pie": {"labels": fdf[x_column], "values": fdf[y_column],},
@@ -68,7 +85,7 @@ class Graph:
 
         elif subvariant in ("training"):
             key_columns = keys
-            traces = [butil.filter_df(idf, filters)]
+            traces = [butil.filter_df(idf, filters, index=index)]
 
             for trace_df in traces:
                 for y_column in y_columns:
@@ -96,16 +113,54 @@ class Graph:
                     fig.add_trace(graph_call(**settings))
 
         elif variant in ("scatter", "bar", "histogram"):
-            traces = butil.prepare_traces(idf, filters, key_columns)
+            traces = butil.prepare_traces(
+                idf, filters, key_columns, index=index, cube=cube
+            )
             traces = butil.trace_analytics(traces, transforms)
+
+            # All traces share the bins of each y column, so their bars line up
+            edges = {}
+            for y_column in y_columns if variant == "histogram" else []:
+                key = cacheutil.freeze(
+                    {
+                        "filters": {key: dict(val) for key, val in filters.items()},
+                        "transforms": transforms,
+                        "y_column": y_column,
+                        "bins": (bins, bin_width, log_bins),
+                    }
+                )
+                edges[y_column] = edge_cache.get((version, key))
+                if version is None or edges[y_column] is None:
+                    values = [trace_df[y_column] for trace_df in traces]
+                    edges[y_column] = butil.histogram_edges(
+                        np.concatenate(values) if values else [],
+                        bins=bins,
+                        width=bin_width,
+                        log=log_bins,
+                    )
+                    if version is not None:
+                        edge_cache.put((version, key), edges[y_column])
+
             for trace_df in traces:
                 y_idx = 1
                 for y_column in y_columns:
                     yaxis = f"y{y_idx}"
 
+                    # Long series are thinned to a point budget, keeping their shape
+                    plot_df = trace_df
+                    if variant == "scatter" and max_points:
+                        if len(trace_df) > max_points:
+                            keep = butil.downsample(
+                                trace_df[x_column],
+                                trace_df[y_column],
+                                max_points,
+                                method=downsample,
+                            )
+                            plot_df = trace_df.iloc[keep]
+
                     default_settings = {
-                        "x": trace_df[x_column],
-                        "y": trace_df[y_column],
+                        "x": plot_df[x_column],
+                        "y": plot_df[y_column],
                         # TODO Fix up hover info for non-map plots
                         # "text": trace_df["hover_info"],
                         "name": f"{trace_df.name} - {y_column.title()}",
@@ -114,9 +169,18 @@ class Graph:
                     if y_idx > 1:
                         default_settings.update({"yaxis": yaxis})
 
-                    data_settings = {
-                        "histogram": {"x": trace_df[y_column]},
-                    }
+                    data_settings = {}
+                    if variant == "histogram":
+                        values = trace_df[y_column].to_numpy(dtype="float64")
+                        counts, _ = np.histogram(values, edges[y_column])
+                        data_settings["histogram"] = {
+                            "x": edges[y_column][:-1],
+                            "y": counts,
+                            "width": np.diff(edges[y_column]),
+                            "offset": 0,
+                            "opacity": opacity,
+                            "name": default_settings["name"],
+                        }
 
                     style_settings = {
                         "scatter": {
@@ -135,11 +199,17 @@ class Graph:
                     # TODO An early way to introduce using marker color that needs work
                     if color:
                         settings["marker_color"] = (
-                            trace_df[color].astype("category").cat.codes
+                            plot_df[color].astype("category").cat.codes
                         )
-                        settings["text"] = trace_df[color]
+                        settings["text"] = plot_df[color]
 
-                    fig.add_trace(graph_call(**settings))
+                    # SVG slows to a crawl on large traces, where WebGL keeps up
+                    trace_call = graph_call
+                    if variant == "scatter" and webgl is not False:
+                        if webgl or len(plot_df) > webgl_threshold:
+                            trace_call = go.Scattergl
+
+                    fig.add_trace(trace_call(**settings))
                     y_idx += 1
 
         barmode = mode if mode in ["stack", "group", "relative"] else "stack"
@@ -178,9 +248,13 @@ class Graph:
 
         if variant == "histogram":
             layout = {
+                "barmode": "overlay",
+                "bargap": 0,
                 "xaxis": {"title": butil.titlize(y_label),},
                 "yaxis": {"title": f"Histogram Count of {y_label}",},
             }
+            if log_bins:
+                layout["xaxis"]["type"] = "log"
 
         fig.update_layout(layout)
         return fig
@@ -199,7 +273,11 @@ class Graph:
         marker_opacity=0.8,
         marker_line_width=0,
         marker_line_color="black",
+        simplify=False,
+        binning=None,
+        cells=None,
         filters={},
+        index=None,
         **kwargs,
     ):
         fig = go.Figure()
@@ -209,10 +287,14 @@ class Graph:
             "marker_opacity": marker_opacity,
             "name": getattr(idf, "name", ""),
         }
-        pdf = butil.filter_df(idf, filters)
-
-        if variant == "scatter":
-            pdf = pdf.groupby(["latitude", "longitude"]).sum().reset_index()
+        pdf = butil.filter_df(idf, filters, index=index)
+
+        if variant == "scatter" and binning:
+            # Points are summed into cells once the zoom level is settled, below
+            args = {**base_args, "marker_size": marker_size}
+        elif variant == "scatter":
+            grouped = pdf.groupby(["latitude", "longitude"], observed=True)
+            pdf = grouped.sum(numeric_only=True).reset_index()
             hovertemplate = "<b>Loc</b><br>Latitude: %{lat}<br>Longitude: %{lon}<br>"
             args = {
                 **base_args,
@@ -244,7 +326,6 @@ class Graph:
             args = {
                 **base_args,
                 "z": pdf[z_column],
-                "geojson": geojson[geo],
                 "text": text,
                 "locations": pdf[loc_column],
                 "marker_line_width": marker_line_width,
@@ -254,9 +335,6 @@ class Graph:
                 "hovertemplate": hovertemplate,
             }
 
-        trace = getattr(go, f"{variant.capitalize()}mapbox")(args)
-        fig.add_trace(trace)
-
         if mapbox_center == "default":
             if "us" in geo:
                 mapbox_center = {"lat": 37.0902, "lon": -95.7129}
@@ -278,6 +356,41 @@ class Graph:
                 magnification = min(lat_multiple, lon_multiple)
                 mapbox_zoom = ref_zoom + math.log(magnification, 2)
 
+        if variant == "scatter" and binning:
+            cdf = butil.aggregate_cells(
+                idf, pdf, mapbox_zoom, shape=binning, z_column=z_column, cells=cells
+            )
+            measure = z_column or "count"
+            hovertemplate = "<b>Cell</b><br>Points: %{customdata[0]}"
+            if z_column:
+                hovertemplate += f"<br>{z_column.title()}: %{{customdata[1]:s}}"
+            args.update(
+                {
+                    "lon": cdf["longitude"],
+                    "lat": cdf["latitude"],
+                    "marker_color": cdf[measure],
+                    "marker_colorscale": butil.log_color_scale("Viridis", base=3),
+                    "customdata": cdf[["count", measure]],
+                    "hovertemplate": hovertemplate,
+                }
+            )
+
+        if variant == "choropleth":
+            # Lighter polygons suffice when the initial view is zoomed out
+            tolerance = resources.tolerance_for_zoom(mapbox_zoom) if simplify else 0
+            if resources.geojson.url_base is None:
+                # Only the features being drawn need to travel with the figure
+                locations = pdf[loc_column].unique()
+                args["geojson"] = resources.geojson.subset(
+                    geo, locations, tolerance=tolerance
+                )
+            else:
+                # The browser fetches and caches geometry served by the app
+                args["geojson"] = resources.geojson.url(geo, tolerance=tolerance)
+
+        trace = getattr(go, f"{variant.capitalize()}mapbox")(args)
+        fig.add_trace(trace)
+
         # Now define the layout
         layout = {
             "margin": {"l": 0, "b": 0, "t": 0, "r": 0},
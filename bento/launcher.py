@@ -9,8 +9,8 @@ logging = logger.fancy_logger("entrypoint")
 logging.info(f"Loading descriptor from ./descriptor.py")
 desc_file = importlib.import_module(f"descriptor")
 
-# This generates the app from the descriptor
-app_def = bento.Bento(desc_file.descriptor)
+# This generates the app from the descriptor, handing the loaded data over to the app
+app_def = bento.Bento(desc_file.descriptor, share_data=True)
 if app_def.valid:
     app_def.write(app_output="bento_app.py")
 
@@ -1,9 +1,18 @@
+import collections.abc
+import contextlib
+import gzip
+import hashlib
 import json
+import os
 import pathlib
 import pkgutil
+import threading
 from urllib import request
 
-from bento.common import logger, dictutil  # noqa
+import flask
+import numpy as np
+
+from bento.common import logger, dictutil, util  # noqa
 
 logging = logger.fancy_logger(__name__)
 
@@ -11,7 +20,6 @@ logging = logger.fancy_logger(__name__)
 init_py_path = pkgutil.get_loader("bento").path
 package_path = pathlib.Path(init_py_path).parent
 
-geojson = {}
 resource_list = [
     ("us_counties", "geojson_us_counties.json"),
     ("us_states", "geojson_us_states.json"),
@@ -29,21 +37,274 @@ web_backup = {
     ),
 }
 location_list = [".", "assets", f"{package_path}/assets"]
-for uid, resource in resource_list:
-    for loc in location_list:
-        try:
-            with open(f"{loc}/{resource}", "r") as fh:
-                geojson[uid] = json.load(fh)
-            logging.info(f"...Loaded {resource}")
-            break
-        except Exception:
+
+# Simplified geometry is cached per user, apart from the searched locations
+cache_location = util.cache_dir("geojson")
+
+# Simplification tolerances in degrees, from barely visible to country-scale views
+tolerance_levels = (0.001, 0.01, 0.05)
+
+
+def tolerance_for_zoom(zoom):
+    """The coarsest tolerance level below half a pixel at a map zoom level"""
+    half_pixel = 360 / (512 * 2 ** zoom)
+    fitting = [level for level in tolerance_levels if level <= half_pixel]
+    return max(fitting, default=0)
+
+
+def _simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of a list of [lon, lat] points"""
+    pts = np.asarray(points, dtype=float)
+    if len(pts) < 5 or pts.ndim != 2:
+        return points
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
             continue
+        inner = pts[start + 1 : end, :2]
+        (x0, y0), (x1, y1) = pts[start, :2], pts[end, :2]
+        length = np.hypot(x1 - x0, y1 - y0)
+        if length:
+            cross = (x1 - x0) * (inner[:, 1] - y0) - (y1 - y0) * (inner[:, 0] - x0)
+            dist = np.abs(cross) / length
+        else:
+            # Closed rings start and end at the same point
+            dist = np.hypot(inner[:, 0] - x0, inner[:, 1] - y0)
+        farthest = int(np.argmax(dist))
+        if dist[farthest] > tolerance:
+            mid = start + 1 + farthest
+            keep[mid] = True
+            stack.extend([(start, mid), (mid, end)])
+    # Rings need four points to remain polygons
+    if keep.sum() < 4:
+        keep[:] = True
+    # Digits finer than the tolerance only add to the payload
+    decimals = max(0, int(np.ceil(-np.log10(tolerance))) + 1)
+    return np.round(pts[keep], decimals).tolist()
+
+
+def simplify(geometry, tolerance):
+    """Simplifies the rings of a Polygon or MultiPolygon geometry"""
+    if not geometry or geometry["type"] not in ("Polygon", "MultiPolygon"):
+        return geometry
+    polygons = geometry["coordinates"]
+    if geometry["type"] == "Polygon":
+        polygons = [polygons]
+    simplified = [
+        [_simplify_line(ring, tolerance) for ring in rings] for rings in polygons
+    ]
+    if geometry["type"] == "Polygon":
+        simplified = simplified[0]
+    return {**geometry, "coordinates": simplified}
+
+
+def _cache_path(cache_dir, json_path, tolerance):
+    """Names the cached simplification of a geojson file at a tolerance level
+
+    The name starts with the file and tolerance, so older variants of the same file
+    can be found and removed, and ends with a key on the file's current state.
+    """
+    json_path = json_path.resolve()
+    stat = json_path.stat()
+    source = hashlib.sha1(str(json_path).encode()).hexdigest()[:8]
+    state = hashlib.sha1(repr([stat.st_mtime_ns, stat.st_size]).encode())
+    prefix = f"{json_path.stem}.{source}.{tolerance}"
+    return pathlib.Path(cache_dir, f"{prefix}.{state.hexdigest()[:16]}.json")
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "r") as fh:
+            return json.load(fh)
+    except Exception:
+        logging.debug(f"Unable to read cache {cache_path}")
+
+
+def _write_cache(obj, cache_path):
+    # Write under a unique name and rename, as workers may race to create the cache
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as fh:
+            json.dump(obj, fh, separators=(",", ":"))
+        os.replace(tmp_path, cache_path)
+    except Exception as exc:
+        logging.debug(f"Unable to write cache {cache_path}: {exc}")
+        with contextlib.suppress(OSError):
+            tmp_path.unlink()
+        return
+
+    # Variants made from an older version of the file are no longer useful
+    prefix = cache_path.name.rsplit(".", 2)[0]
+    for stale in cache_path.parent.glob(f"{prefix}.*.json"):
+        if stale != cache_path:
+            with contextlib.suppress(OSError):
+                stale.unlink()
+
+
+class GeoStore(collections.abc.Mapping):
+    """Geojson by geography, loaded on first use rather than at import
+
+    Simplified variants are made with `get` and cached as geojson in cache_dir, so
+    each is computed once per version of the file. Once an app serves the store (see
+    serve_geojson), figures can reference it by `url`.
+
+    Initialization Parameters
+    -------------------------
+    resources: list
+        Pairs of geography uid and geojson filename
+    locations: list
+        Directories searched for the geojson files, in order
+    web_backup: dict
+        URLs to fetch geographies from when the files can't be found
+    cache_dir: str
+        Directory for the simplified variants, or None to not cache them
+    """
 
-    if uid in web_backup and uid not in geojson:
+    def __init__(self, resources, locations, web_backup=None, cache_dir=None):
+        self.resources = dict(resources)
+        self.locations = locations
+        self.web_backup = web_backup or {}
+        self.cache_dir = cache_dir
+        self.url_base = None
+        self._loaded = {}
+        self._encoded = {}
+        self._features = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, uid):
+        return self.get(uid)
+
+    def __iter__(self):
+        return iter(self.resources)
+
+    def __len__(self):
+        return len(self.resources)
+
+    def get(self, uid, tolerance=0):
+        """Provides a geography, simplified to the tolerance in degrees if given"""
+        if uid not in self.resources:
+            raise KeyError(uid)
+        with self._lock:
+            if (uid, tolerance) not in self._loaded:
+                self._loaded[(uid, tolerance)] = self._load(uid, tolerance)
+            return self._loaded[(uid, tolerance)]
+
+    def features(self, uid, tolerance=0):
+        """Indexes the features of a geography by their id (e.g. fips or alpha3)"""
+        if (uid, tolerance) not in self._features:
+            geo = self.get(uid, tolerance=tolerance)
+            by_id = {str(feature.get("id")): feature for feature in geo["features"]}
+            self._features[(uid, tolerance)] = by_id
+        return self._features[(uid, tolerance)]
+
+    def subset(self, uid, ids, tolerance=0):
+        """Provides a geography holding just the features with the given ids"""
+        by_id = self.features(uid, tolerance=tolerance)
+        picked = [by_id[key] for key in dict.fromkeys(map(str, ids)) if key in by_id]
+        return {**self.get(uid, tolerance=tolerance), "features": picked}
+
+    def url(self, uid, tolerance=0):
+        """Where the browser fetches a geography served by the app"""
+        query = f"?tolerance={tolerance}" if tolerance else ""
+        return f"{self.url_base}{uid}.json{query}"
+
+    def encoded(self, uid, tolerance=0):
+        """Provides a geography as JSON bytes, their gzipped form, and an ETag"""
+        if (uid, tolerance) not in self._encoded:
+            geo = self.get(uid, tolerance=tolerance)
+            body = json.dumps(geo, separators=(",", ":")).encode()
+            etag = hashlib.sha1(body).hexdigest()
+            self._encoded[(uid, tolerance)] = (body, gzip.compress(body), etag)
+        return self._encoded[(uid, tolerance)]
+
+    def _find(self, uid):
+        for loc in self.locations:
+            json_path = pathlib.Path(loc, self.resources[uid])
+            if json_path.is_file():
+                return json_path
+
+    def _load(self, uid, tolerance):
+        json_path = self._find(uid)
+        cache_path = None
+        # The full geometry is the file itself, so only simplified variants are cached
+        if json_path and tolerance and self.cache_dir:
+            cache_path = _cache_path(self.cache_dir, json_path, tolerance)
+        if cache_path and cache_path.is_file():
+            cached = _read_cache(cache_path)
+            if cached is not None:
+                return cached
+
+        if tolerance:
+            # Called with the lock held, so the full geometry is loaded just once
+            if (uid, 0) not in self._loaded:
+                self._loaded[(uid, 0)] = self._load(uid, 0)
+            full = self._loaded[(uid, 0)]
+            features = [
+                {**feature, "geometry": simplify(feature.get("geometry"), tolerance)}
+                for feature in full.get("features", [])
+            ]
+            loaded = {**full, "features": features}
+        elif json_path:
+            with open(json_path, "r") as fh:
+                loaded = json.load(fh)
+            logging.info(f"...Loaded {json_path.name}")
+        else:
+            loaded = self._fetch(uid)
+
+        if cache_path:
+            _write_cache(loaded, cache_path)
+        return loaded
+
+    def _fetch(self, uid):
+        if uid not in self.web_backup:
+            raise KeyError(f"Unable to find geojson[{uid}]")
         logging.info("   Trying web...")
         try:
-            with request.urlopen(web_backup[uid]) as response:
-                geojson[uid] = json.load(response)
-                logging.info(f"...Loaded {resource} from web")
-        except Exception:
+            with request.urlopen(self.web_backup[uid]) as response:
+                loaded = json.load(response)
+                logging.info(f"...Loaded {self.resources[uid]} from web")
+                return loaded
+        except Exception as exc:
             logging.warning(f"   ...Failed to load geojson[{uid}]")
+            raise KeyError(uid) from exc
+
+
+geojson = GeoStore(resource_list, location_list, web_backup, cache_location)
+
+
+def serve_geojson(app, store=geojson, route="_bento/geojson/"):
+    """Serves a geojson store from a Dash app, so figures can reference it by URL
+
+    Responses carry an ETag and may be cached by the browser, so each geography is
+    downloaded once instead of with every figure that draws it.
+    """
+    store.url_base = app.config.requests_pathname_prefix + route
+
+    def serve(uid):
+        try:
+            tolerance = float(flask.request.args.get("tolerance", 0))
+        except ValueError:
+            flask.abort(404)
+        # Only the standard levels are served, so requests can't force new work
+        if uid not in store or tolerance not in (0, *tolerance_levels):
+            flask.abort(404)
+        body, compressed, etag = store.encoded(uid, tolerance)
+
+        response = flask.Response(mimetype="application/json")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 24 * 60 * 60
+        response.vary.add("Accept-Encoding")
+        if "gzip" in flask.request.accept_encodings:
+            response.content_encoding = "gzip"
+            response.set_data(compressed)
+        else:
+            response.set_data(body)
+        return response.make_conditional(flask.request)
+
+    rule = f"{app.config.routes_pathname_prefix}{route}<uid>.json"
+    app.server.add_url_rule(rule, "bento_geojson", serve)
@@ -3,11 +3,14 @@ from bento.common import logger, datautil
 logging = logger.fancy_logger(__name__)
 
 
-def load():
+def load(**kwargs):
     filename = "sample_covid_data.csv"
+    keys = ["county", "state", "fips"]
+    types = {"date": "date", "cases": int, "deaths": int}
+    args = datautil.schema_args(keys, types, **kwargs)
     data = {
-        "df": datautil.df_loader(filename, parse_dates=["date"]),
-        "keys": ["county", "state", "fips"],
-        "types": {"date": "date", "cases": int, "deaths": int,},
+        "df": datautil.df_loader(filename, parse_dates=["date"], **args),
+        "keys": keys,
+        "types": types,
     }
     return data
@@ -3,11 +3,14 @@ from bento.common import logger, datautil
 logging = logger.fancy_logger(__name__)
 
 
-def load():
+def load(**kwargs):
     filename = "sample_mars_data.csv"
+    keys = ["region", "city"]
+    types = {"date": "date", "population": int, "energy_consumption": float}
+    args = datautil.schema_args(keys, types, **kwargs)
     data = {
-        "df": datautil.df_loader(filename, parse_dates=False),
-        "keys": ["region", "city"],
-        "types": {"date": "date", "population": int, "energy_consumption": float,},
+        "df": datautil.df_loader(filename, parse_dates=False, **args),
+        "keys": keys,
+        "types": types,
     }
     return data
@@ -3,17 +3,20 @@ from bento.common import logger, datautil
 logging = logger.fancy_logger(__name__)
 
 
-def load():
+def load(**kwargs):
     filename = "sample_oilngas_data.csv"
+    keys = ["county", "type", "status"]
+    types = {
+        "date": int,
+        "wells": int,
+        "water_produced": float,
+        "oil_produced": float,
+        "gas_produced": float,
+    }
+    args = datautil.schema_args(keys, types, **kwargs)
     data = {
-        "df": datautil.df_loader(filename, parse_dates=False),
-        "keys": ["county", "type", "status"],
-        "types": {
-            "date": int,
-            "wells": int,
-            "water_produced": float,
-            "oil_produced": float,
-            "gas_produced": float,
-        },
+        "df": datautil.df_loader(filename, parse_dates=False, **args),
+        "keys": keys,
+        "types": types,
     }
     return data
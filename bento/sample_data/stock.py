@@ -3,17 +3,20 @@ from bento.common import logger, datautil
 logging = logger.fancy_logger(__name__)
 
 
-def load():
+def load(**kwargs):
     filename = "sample_stock_data.csv"
+    keys = ["symbol"]
+    types = {
+        "open": float,
+        "low": float,
+        "high": float,
+        "close": float,
+        "volume": int,
+    }
+    args = datautil.schema_args(keys, types, **kwargs)
     data = {
-        "df": datautil.df_loader(filename, parse_dates=["date"]),
-        "keys": ["symbol"],
-        "types": {
-            "open": float,
-            "low": float,
-            "high": float,
-            "close": float,
-            "volume": int,
-        },
+        "df": datautil.df_loader(filename, parse_dates=["date"], **args),
+        "keys": keys,
+        "types": types,
     }
     return data
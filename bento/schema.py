@@ -44,6 +44,7 @@ descriptor_schema = {
     },
     "data": {"type": "dict"},
     "show_help": {"type": "boolean"},
+    "figure_cache_mb": {"type": "number", "min": 0},
     "pages": {
         "type": "dict",
         "allow_unknown": True,
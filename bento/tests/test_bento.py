@@ -0,0 +1,71 @@
+import ast
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from bento import Bento
+
+texts = {
+    "default": 'Pick a "column"',
+    "cases": "Cases\nper day",
+    "deaths": "Back\\slash and 'quotes'",
+}
+
+
+def clientside_functions(app_path):
+    """The JavaScript of each clientside callback in a generated app"""
+    tree = ast.parse(app_path.read_text())
+    functions = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        if getattr(node.func, "attr", None) == "clientside_callback":
+            if isinstance(node.args[0], ast.Constant):
+                functions.append(node.args[0].value)
+    return functions
+
+
+def test_clientside_text(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    page = {
+        "dataid": "covid",
+        "banks": {
+            "axis": {"type": "axis_controls", "args": {"use": "x"}},
+            "info": {"type": "text_box", "text": texts},
+        },
+        "layout": [["axis", "info"]],
+        "connections": {"axis": {"info"}},
+    }
+    descriptor = {
+        "data": {"covid": {"module": "bento.sample_data.covid"}},
+        "pages": {"trends": page},
+    }
+    Bento(descriptor).write(app_output="app.py")
+
+    function = next(
+        code for code in clientside_functions(tmp_path / "app.py") if "texts" in code
+    )
+    literal = function.split("const texts = ", 1)[1].split(";\n", 1)[0]
+    assert json.loads(literal) == texts
+
+    node = shutil.which("node")
+    if not node:
+        pytest.skip("node is needed to evaluate the generated JavaScript")
+
+    def run(value):
+        script = f"""
+            globalThis.dash_clientside = {{callback_context: {{inputs: {{
+                "trends/axis|x_column.value": {json.dumps(value)}
+            }}}}}};
+            const callback = {function.strip()};
+            process.stdout.write(JSON.stringify(callback({json.dumps(value)})));
+        """
+        result = subprocess.run([node, "-e", script], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout)
+
+    assert run("cases") == texts["cases"]
+    # Names inherited by every object are not options
+    assert run("constructor") == texts["default"]
@@ -0,0 +1,31 @@
+import numpy as np
+
+from bento.common import cacheutil
+
+
+def test_lru_budget():
+    cache = cacheutil.LRUCache(max_bytes=2500)
+    for key in "abc":
+        cache.put(key, np.zeros(100))
+    # Each array holds 800 bytes, so all three fit the budget
+    assert cache.get("a") is not None
+
+    # "b" is now the least recently used, and is evicted for the newcomer
+    cache.put("d", np.zeros(100))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Values beyond the whole budget are never cached
+    cache.put("e", np.zeros(1000))
+    assert cache.get("e") is None
+
+
+def test_freeze():
+    first = {"symbol_filter": ["B", "A"], "y_column": ["open", "close"]}
+    second = {"y_column": ["open", "close"], "symbol_filter": ["A", "B"]}
+    third = {"y_column": ["close", "open"], "symbol_filter": ["A", "B"]}
+    key = cacheutil.freeze(first, unordered=["_filter"])
+    assert key == cacheutil.freeze(second, unordered=["_filter"])
+    assert key != cacheutil.freeze(third, unordered=["_filter"])
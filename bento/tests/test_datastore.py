@@ -0,0 +1,33 @@
+from bento import datastore
+
+entries = {"covid": {"module": "bento.sample_data.covid", "call": "load", "args": {}}}
+
+
+def test_fetch_shared():
+    built = datastore.load_all(entries, share=True)
+    fetched = datastore.fetch(entries)
+    assert fetched["covid"] is built["covid"]
+
+    # Shared data is handed over once; later fetches load afresh
+    assert datastore.fetch(entries)["covid"] is not built["covid"]
+
+
+def test_fetch_mismatch():
+    datastore.load_all(entries, share=True)
+    changed = {"covid": {**entries["covid"], "args": {"cache": False}}}
+    assert datastore.fetch(changed)["covid"]["df"].shape[0] > 0
+    assert not datastore._shared
+
+
+def test_reload_swap():
+    store = datastore.fetch(entries)
+    held = store["covid"]
+    swapped = []
+    store.on_swap(swapped.extend)
+    assert store.reload() == ["covid"]
+    assert swapped == ["covid"]
+
+    # Callbacks holding the old dataset keep it intact, new lookups see the reload
+    assert store["covid"] is not held
+    assert store["covid"]["version"] > held["version"]
+    assert held["df"].shape == store["covid"]["df"].shape
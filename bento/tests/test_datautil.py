@@ -0,0 +1,126 @@
+import pandas as pd
+import pytest
+
+from bento.common import datautil
+
+
+def write_csv(tmp_path):
+    csv = tmp_path / "sample.csv"
+    csv.write_text("date,symbol,price\n2020-01-01,A,1.5\n2020-01-02,B,2.5\n")
+    return csv
+
+
+def test_df_loader_cache(tmp_path):
+    pytest.importorskip("pyarrow")
+    csv = write_csv(tmp_path)
+    cache_dir = tmp_path / "cache"
+    args = {"location": str(tmp_path), "cache_dir": cache_dir}
+
+    first = datautil.df_loader(csv.name, parse_dates=["date"], **args)
+    sidecars = list(cache_dir.glob("sample.*.feather"))
+    assert len(sidecars) == 1
+    # Nothing is written next to the CSV itself
+    assert list(tmp_path.glob("*.feather")) == []
+
+    second = datautil.df_loader(csv.name, parse_dates=["date"], **args)
+    pd.testing.assert_frame_equal(first, second)
+
+    # Other parse arguments key their own sidecar, alongside the first
+    datautil.df_loader(csv.name, **args)
+    assert len(list(cache_dir.glob("sample.*.feather"))) == 2
+
+    # Changing the CSV drops the sidecars of its older version
+    csv.write_text("date,symbol,price\n2020-01-03,C,3.5\n")
+    third = datautil.df_loader(csv.name, parse_dates=["date"], **args)
+    assert list(third["symbol"]) == ["C"]
+    assert len(list(cache_dir.glob("sample.*.feather"))) == 1
+    assert not sidecars[0].exists()
+
+
+def test_df_loader_schema(tmp_path):
+    csv = write_csv(tmp_path)
+    args = datautil.schema_args(["symbol", "absent"], {"price": float}, usecols=["x"])
+    df = datautil.df_loader(csv.name, location=str(tmp_path), cache=False, **args)
+
+    # Columns outside the declared schema and requested usecols are pruned
+    assert list(df.columns) == ["symbol", "price"]
+    assert str(df["symbol"].dtype) == "category"
+    assert str(df["price"].dtype) == "float64"
+
+
+def test_compact():
+    idf = pd.DataFrame(
+        {"symbol": ["A", "B", "A"], "count": [1, 2, 300], "price": [0.5, 1.25, 0.1]}
+    )
+    idf = pd.concat([idf] * 100, ignore_index=True)
+    data = {"df": idf, "keys": ["symbol"]}
+    assert datautil.compact(data) > 0
+
+    odf = data["df"]
+    assert str(odf["symbol"].dtype) == "category"
+    assert str(odf["count"].dtype) == "int16"
+    # 0.1 has no exact float32 representation, so the price column is kept
+    assert str(odf["price"].dtype) == "float64"
+    pd.testing.assert_frame_equal(odf, idf, check_dtype=False, check_categorical=False)
+
+
+def test_search():
+    idf = pd.DataFrame({"county": ["Harris", "Hardin", "Anderson", "Sonoma", "Dallas"]})
+    index = datautil.build_search(idf, ["county"])["county"]
+    assert datautil.search(index, "har") == ["Hardin", "Harris"]
+    # Prefix matches come before those found by trigram
+    assert datautil.search(index, "SON") == ["Sonoma", "Anderson"]
+    assert datautil.search(index, "", limit=2) == ["Anderson", "Dallas"]
+    assert datautil.search(index, "xyz") == []
+
+
+def test_cooccurring():
+    idf = pd.DataFrame(
+        {
+            "state": ["Texas", "Texas", "Georgia", "Ohio", "Ohio"],
+            "county": ["Harris", "Dallas", "Harris", "Adams", "Adams"],
+            "cases": [1, 2, 3, 4, 5],
+        }
+    )
+    combos = datautil.build_combos(idf, ["state", "county", "cases"])
+    assert combos["columns"] == ["state", "county"]
+    assert len(combos["codes"]) == 4
+
+    assert datautil.cooccurring(combos, "county", {"state": []}) is None
+    selections = {"state": ["Texas", "Ohio"], "county": ["Dallas"]}
+    assert datautil.cooccurring(combos, "county", selections) == [
+        "Adams",
+        "Dallas",
+        "Harris",
+    ]
+    selections = {"state": ["Texas", "Georgia"], "county": ["Harris"]}
+    assert datautil.cooccurring(combos, "state", selections) == ["Georgia", "Texas"]
+
+
+def test_column_stats():
+    idf = pd.DataFrame(
+        {
+            "symbol": pd.Categorical(["B", "A", None, "B"], categories=["A", "B", "C"]),
+            "price": [4.0, 1.0, None, 2.0],
+        }
+    )
+    stats = datautil.build_stats(idf)
+    symbol = stats["symbol"]
+    assert (symbol["count"], symbol["nulls"], symbol["distinct"]) == (3, 1, 2)
+    assert list(symbol["values"]) == ["A", "B"]
+    assert (symbol["min"], symbol["max"], symbol["quantiles"]) == ("A", "B", None)
+
+    price = stats["price"]
+    assert price["dtype"] == "float64" and price["quantiles"][0.5] == 2.0
+    assert (price["min"], price["max"]) == (1.0, 4.0)
+    assert datautil.column_stats(idf["price"], max_values=2)["values"] is None
+
+
+def test_sample_keys():
+    from bento.sample_data import covid
+
+    # Keys are parsed as strings, so fips codes keep their leading zeros
+    df = covid.load()["df"]
+    assert str(df["fips"].dtype) == "category"
+    assert df["fips"].iloc[0] == "01001"
+    assert df["fips"].cat.categories.map(type).unique().tolist() == [str]
@@ -0,0 +1,70 @@
+import json
+
+from bento import resources
+
+
+def test_simplify_ring():
+    # A square with a slight wobble along each side
+    ring = [[0, 0], [0.5, 0.001], [1, 0], [1.001, 0.5], [1, 1], [0.5, 1], [0, 1]]
+    ring.append(ring[0])
+    geometry = {"type": "Polygon", "coordinates": [ring]}
+    simplified = resources.simplify(geometry, 0.01)["coordinates"][0]
+    assert simplified == [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+    detailed = resources.simplify(geometry, 0.0001)["coordinates"][0]
+    assert [0.5, 0.001] in detailed and [1.001, 0.5] in detailed
+    assert [0.5, 1] not in detailed
+
+
+def test_lazy_store(tmp_path):
+    square = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+    feature = {"id": "01", "geometry": {"type": "Polygon", "coordinates": [square]}}
+    source = tmp_path / "shapes.json"
+    source.write_text(json.dumps({"features": [feature]}))
+    cache_dir = tmp_path / "cache"
+
+    store = resources.GeoStore([("shapes", "shapes.json")], [tmp_path], None, cache_dir)
+    assert not store._loaded
+    assert store["shapes"]["features"][0]["id"] == "01"
+    assert not cache_dir.exists()
+    simplified = store.get("shapes", tolerance=0.01)
+    cached = list(cache_dir.glob("shapes.*.0.01.*.json"))
+    assert len(cached) == 1 and not list(tmp_path.glob(".*"))
+
+    # A fresh store reads the cached variant
+    fresh = resources.GeoStore([("shapes", "shapes.json")], [tmp_path], None, cache_dir)
+    assert fresh.get("shapes", tolerance=0.01) == simplified
+
+    # Variants of an older version of the file are pruned
+    source.write_text(json.dumps({"features": [feature, {**feature, "id": "02"}]}))
+    fresh = resources.GeoStore([("shapes", "shapes.json")], [tmp_path], None, cache_dir)
+    assert len(fresh.get("shapes", tolerance=0.01)["features"]) == 2
+    assert list(cache_dir.glob("shapes.*.json")) != cached
+    assert len(list(cache_dir.glob("shapes.*.json"))) == 1
+
+
+def test_serve_geojson():
+    import dash
+
+    app = dash.Dash("geo")
+    app.layout = dash.html.Div()
+    store = resources.GeoStore(resources.resource_list, resources.location_list)
+    resources.serve_geojson(app, store=store)
+    assert store.url("us_states") == "/_bento/geojson/us_states.json"
+
+    client = app.server.test_client()
+    response = client.get(store.url("us_states"))
+    assert response.status_code == 200
+    assert json.loads(response.data) == store["us_states"]
+
+    # Browsers revalidate with the ETag, and unknown requests are refused
+    revalidate = {"If-None-Match": response.headers["ETag"]}
+    cached = client.get(store.url("us_states"), headers=revalidate)
+    assert cached.status_code == 304
+    assert client.get(store.url("us_states", tolerance=0.5)).status_code == 404
+    assert client.get("/_bento/geojson/mars.json").status_code == 404
+
+
+def test_subset():
+    subset = resources.geojson.subset("us_states", ["06", "48", "06", "99"])
+    assert [feature["id"] for feature in subset["features"]] == ["06", "48"]
+    assert subset["type"] == resources.geojson["us_states"]["type"]
@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+from bento import util as butil
+from bento.common import datautil
+from bento.sample_data import covid, stock
+
+data = covid.load()
+idf = data["df"]
+index = datautil.build_index(idf, data["keys"])
+cube = datautil.build_cube(idf, data["keys"])
+
+filter_cases = [
+    {"or": {"state": ["Alabama", "Texas"]}},
+    {"or": {"state": ["Alabama"], "county": ["Autauga", "Harris"]}},
+    {"and": {"state": ["Texas"], "county": ["Harris", "Missing"]}},
+    {"between": {"date": ["2020-05-16", "2020-05-20"]}, "or": {"state": ["Ohio"]}},
+]
+
+
+def assert_traces_equal(traces, expected):
+    assert [trace.name for trace in traces] == [trace.name for trace in expected]
+    for trace, expected_trace in zip(traces, expected):
+        pd.testing.assert_frame_equal(trace, expected_trace)
+
+
+def test_filter_df_index():
+    for filters in filter_cases:
+        expected = butil.filter_df(idf, filters)
+        pd.testing.assert_frame_equal(butil.filter_df(idf, filters, index), expected)
+
+
+def test_prepare_traces_index():
+    for filters in filter_cases:
+        expected = butil.prepare_traces(idf, filters, ["date"])
+        traces = butil.prepare_traces(idf, filters, ["date"], index=index)
+        assert_traces_equal(traces, expected)
+
+
+def test_prepare_traces_cube():
+    for filters in [{}] + filter_cases[:2] + filter_cases[3:]:
+        expected = butil.prepare_traces(idf, filters, ["date"])
+        traces = butil.prepare_traces(idf, filters, ["date"], cube=cube)
+        assert_traces_equal(traces, expected)
+
+
+def test_prepare_traces_cube_logics():
+    # Traces of several logics are the cross product of their values
+    cases = [
+        {"and": {"state": ["Texas", "Ohio"]}, "or": {"state": ["Alabama"]}},
+        {"and": {"state": ["Texas"]}, "or": {"county": []}},
+        {"or": {"state": []}},
+        {"between": {}},
+    ]
+    for filters in cases:
+        expected = butil.prepare_traces(idf, filters, ["date"])
+        traces = butil.prepare_traces(idf, filters, ["date"], cube=cube)
+        assert_traces_equal(traces, expected)
+    assert butil.cube_traces(cube, cases[0], ["date"]) is None
+
+
+def test_prepare_traces_reference():
+    filters = {
+        "between": {"date": ["2020-05-16", "2020-05-20"]},
+        "or": {"state": ["Texas", "Ohio", "Missing"], "county": ["Harris"]},
+    }
+    traces = butil.prepare_traces(idf, filters, ["date"])
+    names = [" Texas", " Ohio", " Missing", " Harris"]
+    assert [trace.name for trace in traces] == names
+
+    in_range = idf[idf["date"].between("2020-05-16", "2020-05-20")]
+    for pos, column, value in [(0, "state", "Texas"), (3, "county", "Harris")]:
+        trace = traces[pos]
+        selected = in_range[in_range[column] == value]
+        expected = selected.groupby("date").sum(numeric_only=True).reset_index()
+        pd.testing.assert_frame_equal(trace, expected)
+    assert traces[2].empty
+
+
+def test_prepare_traces_order():
+    # Categories out of value order still give traces sorted by key value
+    sdf = idf[idf["state"].isin(["Texas", "Ohio"])]
+    plain = sdf.astype({"state": str, "county": str})
+    counties = sdf["county"].cat.categories
+    cdf = sdf.assign(county=sdf["county"].cat.set_categories(counties[::-1]))
+    filters = {"or": {"state": ["Texas", "Ohio"]}}
+    for key_columns in [["county"], ["date", "county"]]:
+        traces = butil.prepare_traces(cdf, filters, key_columns)
+        for trace, state in zip(traces, ["Texas", "Ohio"]):
+            selected = plain[plain["state"] == state]
+            expected = selected.groupby(key_columns).sum(numeric_only=True)
+            keys = trace[key_columns].astype({"county": str})
+            pd.testing.assert_frame_equal(keys, expected.reset_index()[key_columns])
+
+
+def test_downsample_keeps_extremes():
+    x = pd.date_range("2020-01-01", periods=10000, freq="min")
+    y = pd.Series(range(10000), dtype="float64") % 97
+    y[5000], y[7000] = 500.0, -500.0
+    for method in ("lttb", "minmax"):
+        keep = butil.downsample(x, y, 200, method=method)
+        assert len(keep) <= 202
+        assert keep[0] == 0 and keep[-1] == 9999
+        assert {5000, 7000} <= set(keep)
+        assert (keep[1:] > keep[:-1]).all()
+
+
+def test_aggregate_cells():
+    wells = pd.DataFrame(
+        {
+            "latitude": [40.0, 40.0001, 40.0002, 45.0, None],
+            "longitude": [-100.0, -100.0001, -100.0, -90.0, -95.0],
+            "oil": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+    for shape in ("square", "hex"):
+        cells = datautil.build_cells(wells, shape=shape, zooms=[4, 8])
+        direct = butil.aggregate_cells(wells, wells.iloc[:4], 8, shape, "oil")
+        precomputed = butil.aggregate_cells(
+            wells, wells.iloc[:4], 8, shape, "oil", cells=cells
+        )
+        pd.testing.assert_frame_equal(precomputed, direct)
+        assert sorted(direct["count"]) == [1, 3]
+        assert sorted(direct["oil"]) == [4.0, 6.0]
+        assert (direct["latitude"] - 40).abs().min() < 0.5
+
+
+def test_compact_figure():
+    import base64
+    import plotly.graph_objects as go
+
+    dates = pd.date_range("2020-01-01", periods=3)
+    y, color = np.array([1.23456, 2.5, np.nan]), np.array([1, 2, 3])
+    trace = go.Scatter(x=dates, y=y, marker_color=color)
+    figure = go.Figure(trace)
+    compact = butil.compact_figure(figure, precision={"y": 2})
+    assert list(compact["data"][0]["x"]) == ["2020-01-01", "2020-01-02", "2020-01-03"]
+    assert compact["data"][0]["y"][0] == 1.23
+
+    typed = butil.compact_figure(figure, typed_arrays=True)["data"][0]["marker"]
+    assert typed["color"]["dtype"] == "i4"
+    decoded = np.frombuffer(base64.b64decode(typed["color"]["bdata"]), "<i4")
+    assert list(decoded) == [1, 2, 3]
+
+
+def test_restyle_patch():
+    # Each column of a range filter narrows its own copy of the traces
+    multi_between = {
+        "between": {"date": ["2020-05-16", "2020-05-20"], "cases": [0, 100]},
+        "or": {"state": ["Texas", "Ohio"]},
+    }
+    for filters in filter_cases + [multi_between, {"between": {}}]:
+        traces = butil.prepare_traces(idf, filters, ["date"])
+        assert butil.trace_count(filters) == len(traces)
+
+    triggered = [{"prop_id": "page/bank|marker_size.value", "value": 4}]
+    assert butil.presentation_only(triggered)
+    triggered.append({"prop_id": "page/bank|state_filter.value", "value": []})
+    assert not butil.presentation_only(triggered)
+
+    inputs = {"marker_size": 4, "y_scale": "log", "y_column": ["cases", "deaths"]}
+    patch = butil.restyle_patch(inputs, filter_cases[0]).to_plotly_json()
+    locations = [op["location"] for op in patch["operations"]]
+    assert len(locations) == 2 * 2 + 2
+    assert ["data", 3, "marker", "size"] in locations
+    assert ["layout", "yaxis2", "type"] in locations
+
+
+def test_histogram_edges():
+    values = [1.0, 2.0, 2.5, 9.0, float("nan")]
+    edges = butil.histogram_edges(values, bins=4)
+    assert len(edges) == 5 and edges[0] == 1.0 and edges[-1] == 9.0
+    assert list(butil.histogram_edges(values, width=4)) == [0.0, 4.0, 8.0, 12.0]
+
+    log_edges = butil.histogram_edges([0.0, 1.0, 10.0, 100.0], bins=2, log=True)
+    assert list(log_edges) == [1.0, 10.0, 100.0]
+
+    # Every positive value lands in a bar, including the maximum
+    volume = stock.load()["df"]["volume"].astype("float64")
+    positive = volume[volume > 0]
+    counts, _ = np.histogram(positive, butil.histogram_edges(volume, log=True))
+    assert counts.sum() == len(positive)
+
+
+def test_query_df():
+    terms = butil.parse_filter_query('{cases} >= 100 && {state} icontains "tex"')
+    assert terms == [("cases", "ge", 100.0), ("state", "icontains", "tex")]
+
+    fdf = butil.query_df(idf, '{cases} >= 100 && {state} icontains "tex"')
+    expected = idf[(idf.cases >= 100) & (idf.state.astype(str) == "Texas")]
+    assert fdf.index.equals(expected.index)
+    fdf = butil.query_df(idf, "{county} = Harris && {date} datestartswith 2020-05")
+    assert set(fdf.county) == {"Harris"} and set(fdf.date.dt.month) == {5}
+
+    sort_by = [
+        {"column_id": "county", "direction": "desc"},
+        {"column_id": "cases", "direction": "asc"},
+    ]
+    sdf = butil.sort_df(idf, sort_by)
+    expected = idf.assign(county=idf.county.astype(str))
+    expected = expected.sort_values(["county", "cases"], ascending=[False, True])
+    assert list(sdf.county.astype(str)) == list(expected.county)
+    assert list(sdf.cases) == list(expected.cases)
+
+
+def test_to_records():
+    fdf = idf.head(3).assign(cases=[None, 2.0, 3.0])
+    records = butil.to_records(fdf, ["state", "cases", "missing", "date"])
+    assert list(records[0]) == ["state", "cases", "date"]
+    assert records[0]["cases"] is None and records[1]["cases"] == 2.0
+    assert records[0]["date"] == fdf.date.iloc[0].isoformat()
+    assert butil.to_records(fdf, []) == []
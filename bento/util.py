@@ -1,10 +1,16 @@
+import base64
+import dash
+import datetime as dt
+import functools
 import pandas as pd
 import numpy as np
 import math
+import operator
 import plotly.express as px
+import re
 
 from collections import defaultdict
-from bento.common import logger, logutil, dictutil  # noqa
+from bento.common import logger, logutil, dictutil, datautil  # noqa
 
 logging = logger.fancy_logger(__name__)
 
@@ -74,27 +80,228 @@ def prepare_filters(inputs):
     return filters
 
 
+def match(series, values):
+    """Boolean mask of where the series is in values
+
+    Categorical columns are matched on their integer codes rather than the labels.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.categories.get_indexer(values)
+        return np.isin(series.cat.codes.to_numpy(), codes[codes >= 0])
+    return series.isin(values).to_numpy()
+
+
+def between(series, values):
+    """Boolean mask of the series lying within the inclusive range of values"""
+    # TODO generalize filters to handle types
+    try:
+        return (series >= values[0]) & (series <= values[1])
+    except TypeError:
+        return (series.astype(int) >= values[0]) & (series.astype(int) <= values[1])
+
+
+def trace_name(name, value):
+    """Extends a trace name by a filter value"""
+    try:
+        return name + " " + value
+    except Exception:
+        return name + " " + pd.to_datetime(value).strftime("%Y-%m-%d")
+
+
+def index_rows(index, filters, across="and"):
+    """Resolves the value filters to sorted row positions using a dataset index
+
+    Values of one column are combined as a union and columns are combined according
+    to `across`. Returns None if any filtered column is not indexed.
+    """
+    column_rows = []
+    for logic, columns in filters.items():
+        if logic == "between":
+            continue
+        for column, values in columns.items():
+            if column not in (index or {}):
+                return None
+            rows = [index[column].get(value) for value in values]
+            rows = [item for item in rows if item is not None]
+            if rows:
+                column_rows.append(np.unique(np.concatenate(rows)))
+            else:
+                column_rows.append(np.array([], dtype=np.int64))
+    if not column_rows:
+        return None
+
+    combined = column_rows[0]
+    for rows in column_rows[1:]:
+        if across == "and":
+            combined = np.intersect1d(combined, rows, assume_unique=True)
+        else:
+            combined = np.union1d(combined, rows)
+    return combined
+
+
+# Relational operators of DataTable filter queries, with their symbolic aliases
+query_operators = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+}
+query_aliases = {"=": "eq", "!=": "ne", "<": "lt", "<=": "le", ">": "gt", ">=": "ge"}
+query_pattern = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s*"
+    r"(?P<op>is blank|s?[!<>]?=|[<>]|[is]?(?:eq|ne|lt|le|gt|ge|contains)\b|"
+    r"datestartswith\b)\s*(?P<value>.*?)\s*$"
+)
+
+
+def parse_filter_query(query):
+    """Splits a DataTable filter query into (column, operator, value) terms
+
+    Operators are normalized to their word form, keeping an "i" prefix for case
+    insensitive matches. Quoted values stay strings and others become numbers
+    where they parse as such.
+    """
+    terms = []
+    for part in (query or "").split(" && "):
+        found = query_pattern.match(part)
+        if not found:
+            if part.strip():
+                logging.debug(f"Ignoring filter query term {part}")
+            continue
+        column, op, value = found.group("column", "op", "value")
+        op = query_aliases.get(op.lstrip("s"), op)
+        if op.startswith("s"):
+            op = op[1:]
+        if value[:1] in "\"'`" and value[-1:] == value[:1] and len(value) > 1:
+            value = value[1:-1]
+        else:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        terms.append((column, op, value))
+    return terms
+
+
+def _label_mask(series, test):
+    """Applies a test to the string form of the values, once per category if possible"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        labels = pd.Series(series.cat.categories.astype(str))
+        hits = test(labels).to_numpy(dtype=bool)
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, hits[codes], False)
+    return test(series.astype(str)).to_numpy(dtype=bool)
+
+
+def _query_mask(series, op, value):
+    insensitive = op.startswith("i")
+    op = op[1:] if insensitive else op
+    if op == "is blank":
+        return series.isna().to_numpy()
+    if op == "contains":
+        return _label_mask(
+            series, lambda text: text.str.contains(str(value), case=not insensitive)
+        )
+    if op == "datestartswith":
+        if pd.api.types.is_datetime64_any_dtype(series):
+            text = np.datetime_as_string(series.to_numpy(), unit="s")
+            return np.char.startswith(text, str(value))
+        return _label_mask(series, lambda text: text.str.startswith(str(value)))
+
+    compare = query_operators[op]
+    try:
+        if pd.api.types.is_bool_dtype(series):
+            return compare(series, str(value).lower() == "true").to_numpy()
+        if pd.api.types.is_numeric_dtype(series):
+            return compare(series, float(value)).to_numpy(dtype=bool)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return compare(series, pd.Timestamp(str(value))).to_numpy(dtype=bool)
+    except (TypeError, ValueError):
+        return np.zeros(len(series), dtype=bool)
+    value = str(value).lower() if insensitive else str(value)
+    if insensitive:
+        return _label_mask(series, lambda text: compare(text.str.lower(), value))
+    return _label_mask(series, lambda text: compare(text, value))
+
+
+def query_df(idf, query):
+    """Filters a DataFrame by a DataTable filter query, e.g. '{cases} > 100'"""
+    mask = np.ones(len(idf), dtype=bool)
+    for column, op, value in parse_filter_query(query):
+        if column in idf.columns:
+            mask &= _query_mask(idf[column], op, value)
+    return idf if mask.all() else idf[mask]
+
+
+def _sort_key(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Order by the labels, ranking the categories rather than each row
+        ranks = np.argsort(np.argsort(series.cat.categories.astype(str)))
+        codes = series.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, ranks[codes], np.nan), index=series.index)
+    return series
+
+
+def sort_df(idf, sort_by):
+    """Sorts a DataFrame by the sort_by property of a DataTable"""
+    sort_by = [item for item in sort_by or [] if item["column_id"] in idf.columns]
+    if not sort_by:
+        return idf
+    return idf.sort_values(
+        [item["column_id"] for item in sort_by],
+        ascending=[item["direction"] == "asc" for item in sort_by],
+        kind="mergesort",
+        key=_sort_key,
+    )
+
+
+def _column_values(series):
+    """The values of a column as JSON-ready Python objects, with None for nulls"""
+    nulls = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_dtype(series):
+        values = np.datetime_as_string(series.to_numpy(), unit="s").astype(object)
+    else:
+        values = np.array(series.tolist(), dtype=object)
+    if nulls.any():
+        values[nulls] = None
+    return values.tolist()
+
+
+def to_records(idf, columns=None):
+    """Converts the chosen columns of a DataFrame into a list of row dicts
+
+    Unlike DataFrame.to_dict("records"), this converts each column in one pass and
+    leaves out the columns not asked for.
+    """
+    columns = idf.columns if columns is None else columns
+    columns = [col for col in columns if col in idf.columns]
+    columns = list(dict.fromkeys(columns))
+    values = [_column_values(idf[col]) for col in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
 # NOTE Currently used for pie charts and ranking
 # @logutil.loginfo(level='debug')
-def filter_df(idf, filters):
+def filter_df(idf, filters, index=None):
     odf = idf
+    # Gather the rows matching all value filters in one go, if they're indexed
+    rows = index_rows(index, filters)
+    if rows is not None:
+        odf = idf.take(rows)
     for logic, columns in filters.items():
+        if rows is not None and logic != "between":
+            continue
         for column, values in columns.items():
             if "datetime" in str(type(values[0])):
                 values = [np.datetime64(item) for item in values]
             if logic == "between":
-                # TODO generalize filters to handle types
-                try:
-                    odf = odf[(odf[column] >= values[0]) & (odf[column] <= values[1])]
-                except TypeError:
-                    odf = odf[
-                        (odf[column].astype(int) >= values[0])
-                        & (odf[column].astype(int) <= values[1])
-                    ]
+                odf = odf[between(odf[column], values)]
             elif logic == "or":
-                odf = odf[odf[column].isin(values)]
+                odf = odf[match(odf[column], values)]
             elif logic == "and":
-                odf = odf[odf[column].isin(values)]
+                odf = odf[match(odf[column], values)]
 
     return odf
 
@@ -103,7 +310,7 @@ def filter_df(idf, filters):
 # TODO Figure out a way around this hack, which manually filters out None strings as
 # a substitute for properly dealing with bipartite dataframes
 def rank(idf, key, text_key, column, count=10, **kwargs):
-    fdf = idf.groupby(key).sum().reset_index()
+    fdf = idf.groupby(key, observed=True).sum(numeric_only=True).reset_index()
     fdf = fdf[fdf[text_key] != "None"]
     fdf = fdf.nlargest(count, column)
     return zip(fdf[text_key], fdf[column])
@@ -136,71 +343,198 @@ def apply_defaults(component_type, raw_inputs, data):
     return inputs
 
 
+def cube_traces(cube, filters, key_columns):
+    """Answers prepare_traces from a pre-aggregated cube, if the request allows it
+
+    Applies when grouping by the cube date alone, with value filters under a single
+    logic on sliced key columns and range filters on the date only. Returns None
+    otherwise, including for value filters under several logics, whose traces are
+    the cross product of each logic's values.
+    """
+    if not cube or list(key_columns) != [cube["date"]]:
+        return None
+    value_logics = [logic for logic in filters if logic != "between"]
+    if len(value_logics) > 1:
+        return None
+    date_range = None
+    value_filters = []
+    for logic, columns in filters.items():
+        # prepare_traces gives no traces for a logic without values
+        if not any(columns.values()):
+            return None
+        for column, values in columns.items():
+            if logic == "between" and column == cube["date"] and not date_range:
+                date_range = values
+            elif logic in ("or", "and") and column in cube["by"]:
+                value_filters.append((column, values))
+            else:
+                return None
+
+    def in_range(cdf):
+        if date_range is None:
+            return cdf.reset_index(drop=True)
+        return cdf[between(cdf[cube["date"]], date_range)].reset_index(drop=True)
+
+    if not value_filters:
+        trace = in_range(cube["totals"])
+        trace.name = ""
+        return [trace]
+
+    traces = []
+    for column, values in value_filters:
+        cdf = cube["by"][column]
+        for value in values:
+            trace = in_range(cdf[match(cdf[column], [value])]).drop(columns=column)
+            trace.name = trace_name("", value)
+            traces.append(trace)
+    return traces
+
+
+def value_codes(series, values):
+    """Positions of each row's value within the (unique) values, or -1 if absent"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        positions = series.cat.categories.get_indexer(values)
+        lookup = np.full(len(series.cat.categories) + 1, -1)
+        found = positions >= 0
+        lookup[positions[found]] = np.arange(len(values))[found]
+        # Missing values have code -1, which picks out the trailing -1 in lookup
+        return lookup[series.cat.codes.to_numpy()]
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = pd.to_datetime(values)
+    return pd.Index(values).get_indexer(series)
+
+
+def trace_specs(filters):
+    """Lays out the traces of the filters, in the order prepare_traces returns them
+
+    Each trace is specified by a name, the columns whose range filters narrow it, and
+    the column values it takes.
+    """
+    specs = [("", (), ())]
+    for logic, columns in filters.items():
+        if logic == "between":
+            specs = [
+                (name, ranges + (column,), picks)
+                for column in columns
+                for name, ranges, picks in specs
+            ]
+        else:
+            specs = [
+                (trace_name(name, value), ranges, picks + ((column, value),))
+                for column, values in columns.items()
+                for name, ranges, picks in specs
+                for value in values
+            ]
+    return specs
+
+
+def sort_groups(result):
+    """Orders grouped rows by the values of their index, like grouping plain columns
+
+    Categorical levels group in the order of their categories, which need not be
+    the order of the values themselves.
+    """
+    levels = [result.index.get_level_values(pos) for pos in range(result.index.nlevels)]
+    if not any(
+        isinstance(level, pd.CategoricalIndex)
+        and not level.categories.is_monotonic_increasing
+        for level in levels
+    ):
+        return result
+    sort_keys = []
+    for level in levels:
+        if isinstance(level, pd.CategoricalIndex):
+            ranks = level.categories.argsort().argsort()
+            sort_keys.append(ranks[level.codes])
+        else:
+            sort_keys.append(pd.factorize(level, sort=True)[0])
+    return result.iloc[np.lexsort(sort_keys[::-1])]
+
+
 # NOTE Used for preparing the traces for graphs
 # TODO Should combine this with filter_df/
 # @logutil.loginfo(level="debug")
-def prepare_traces(idf, filters, key_columns):
-    # NOTE Brought over from figure callback, default multi-column approach
-    # TODO Figure out how to determine default columns from df
-    # column = self.data.get("keys", self.data["columns"][0])[0]
-    # def_x_column = self.data["columns"][1]
-    # idf.groupby(column).max().reset_index().nlargest(8, def_x_column)[column]
-    idf["label"] = ""
-    idf.name = ""
-    traces = [idf]
-    for logic, columns in filters.items():
-        new_traces = []
-        if logic == "between":
-            for column, values in columns.items():
-                for df in traces:
-                    # TODO generalize filters to handle types
-                    try:
-                        new = df[(df[column] >= values[0]) & (df[column] <= values[1])]
-                    except TypeError:
-                        new = df[
-                            (df[column].astype(int) >= values[0])
-                            & (df[column].astype(int) <= values[1])
-                        ]
-                    new.name = df.name
-                    new_traces.append(new)
-        elif logic == "or":
-            for column, values in columns.items():
-                for df in traces:
-                    for value in values:
-                        new = df[df[column] == value]
-                        new.name = df.name
-                        try:
-                            new.name += " " + value
-                        except Exception:
-                            # try:
-                            new.name += " " + pd.to_datetime(value).strftime("%Y-%m-%d")
-                            # except Exception:
-                            #     logging.warning(f"Can't add {column} to trace name")
-                        new_traces.append(new)
-        elif logic == "and":
-            for column, values in columns.items():
-                for df in traces:
-                    for value in values:
-                        new = df[df[column] == value]
-                        new.name = df.name
-                        try:
-                            new.name += " " + value
-                        except Exception:
-                            # try:
-                            new.name += " " + pd.to_datetime(value).strftime("%Y-%m-%d")
-                            # except Exception:
-                            #     logging.warning(f"Can't add {column} to trace name")
-                        new_traces.append(new)
-
-        traces = new_traces
-
-    new_traces = []
-    for df in traces:
+def prepare_traces(idf, filters, key_columns, index=None, cube=None):
+    """Splits the data into named traces by the filters, each grouped by key_columns
+
+    Range filters narrow every trace, while each value of a value filter defines its
+    own trace. Rather than filtering and grouping per trace, the rows of all traces
+    sharing the same filter columns are coded by value and grouped in a single pass.
+    """
+    traces = cube_traces(cube, filters, key_columns)
+    if traces is not None:
+        return traces
+
+    # Narrow down to the rows any trace could use before splitting into traces
+    rows = index_rows(index, filters, across="or")
+    if rows is not None:
+        idf = idf.take(rows)
+
+    # Range masks are shared by all the traces narrowed by the same columns
+    specs = trace_specs(filters)
+    range_masks = {}
+    for _, ranges, _ in specs:
+        if ranges and ranges not in range_masks:
+            masks = [
+                between(idf[column], filters["between"][column]) for column in ranges
+            ]
+            range_masks[ranges] = functools.reduce(operator.and_, masks)
+
+    # Batch together the traces that differ only in the values they take
+    batches = defaultdict(list)
+    for pos, (_, ranges, picks) in enumerate(specs):
+        columns = tuple(column for column, _ in picks)
+        batches[(ranges, columns)].append(pos)
+
+    traces = [None] * len(specs)
+    for (ranges, columns), positions in batches.items():
+        range_mask = range_masks.get(ranges)
+        mask = np.ones(len(idf), dtype=bool) if range_mask is None else range_mask
+        mask = np.asarray(mask)
+        choices, code_arrays = [], []
+        for col_idx, column in enumerate(columns):
+            values = [specs[pos][2][col_idx][1] for pos in positions]
+            values = list(dict.fromkeys(values))
+            codes = value_codes(idf[column], values)
+            mask = mask & (codes >= 0)
+            choices.append(values)
+            code_arrays.append(codes)
+
+        subset = idf[mask]
+        codes = [code[mask] for code in code_arrays]
         if key_columns:
-            new = df.groupby(key_columns).sum().reset_index()
-        new.name = df.name
-        new_traces.append(new)
-    traces = new_traces
+            grouped = subset.groupby([*codes, *key_columns], observed=True)
+            result = sort_groups(grouped.sum(numeric_only=True))
+            empty = subset.iloc[:0].groupby(key_columns, observed=True)
+            empty = empty.sum(numeric_only=True).reset_index()
+            levels = list(range(len(columns)))
+            groups = {(): np.arange(len(result))}
+            if columns:
+                groups = result.groupby(level=levels).indices
+                groups = {
+                    (key if isinstance(key, tuple) else (key,)): group
+                    for key, group in groups.items()
+                }
+
+        for pos in positions:
+            name, _, picks = specs[pos]
+            code_key = tuple(
+                values.index(value) for values, (_, value) in zip(choices, picks)
+            )
+            if not key_columns:
+                selected = np.ones(len(subset), dtype=bool)
+                for code, code_value in zip(codes, code_key):
+                    selected &= code == code_value
+                trace = subset[selected]
+            elif code_key not in groups:
+                trace = empty.copy()
+            else:
+                trace = result.iloc[groups[code_key]]
+                if columns:
+                    trace = trace.reset_index(level=levels, drop=True)
+                trace = trace.reset_index()
+            trace.name = name
+            traces[pos] = trace
 
     return traces
 
@@ -227,13 +561,258 @@ def trace_analytics(traces, transforms):
     return traces
 
 
+def _plot_values(values):
+    """Provides values as floats for geometry, with dates as nanoseconds"""
+    arr = np.asarray(values)
+    if arr.dtype.kind == "M":
+        arr = arr.astype("datetime64[ns]").astype("int64")
+    elif arr.dtype.kind not in "biuf":
+        # Categorical axes are spaced evenly in plotting order
+        return np.arange(len(arr), dtype="float64")
+    return arr.astype("float64")
+
+
+def lttb(x, y, n):
+    """Picks n points by Largest-Triangle-Three-Buckets, returning their positions
+
+    Keeps the first and last points and, from each bucket in between, the point
+    forming the largest triangle with the previous pick and the next bucket's mean.
+    Expects x to be sorted and y finite.
+    """
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype("int64")
+    edges = np.append(edges, size)
+    picks = np.empty(n, dtype="int64")
+    picks[0], picks[-1] = 0, size - 1
+    for bucket in range(n - 2):
+        start, stop, after = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+        mean_x, mean_y = x[stop:after].mean(), y[stop:after].mean()
+        prev_x, prev_y = x[picks[bucket]], y[picks[bucket]]
+        areas = np.abs(
+            (prev_x - mean_x) * (y[start:stop] - prev_y)
+            - (prev_x - x[start:stop]) * (mean_y - prev_y)
+        )
+        picks[bucket + 1] = start + int(np.argmax(areas))
+    return picks
+
+
+def minmax(y, n):
+    """Picks the lowest and highest point from each of n/2 buckets, with both ends"""
+    size = len(y)
+    if n >= size or n < 4:
+        return np.arange(size)
+    buckets = np.arange(size) * (n // 2) // size
+    starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+    picks = [np.array([0, size - 1])]
+    for extreme in (np.minimum, np.maximum):
+        hits = np.flatnonzero(y == extreme.reduceat(y, starts)[buckets])
+        picks.append(hits[np.unique(buckets[hits], return_index=True)[1]])
+    return np.unique(np.concatenate(picks))
+
+
+def downsample(x, y, n, method="lttb"):
+    """Selects positions of at most about n points that preserve a series' shape
+
+    Methods are "lttb" (Largest-Triangle-Three-Buckets) or "minmax", which keeps the
+    extremes of each bucket. Missing values are left out of the selection.
+    """
+    x, y = _plot_values(x), _plot_values(y)
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    order = valid[np.argsort(x[valid], kind="stable")]
+    if method == "minmax":
+        picks = minmax(y[order], n)
+    else:
+        picks = lttb(x[order], y[order], n)
+    return np.sort(order[picks])
+
+
+def aggregate_cells(idf, fdf, zoom, shape="square", z_column=None, cells=None):
+    """Sums filtered rows into map cells, with their count and z_column total
+
+    Uses the cells precomputed for the nearest zoom level if their shape matches,
+    otherwise bins the filtered coordinates directly.
+    """
+    zoom = int(round(zoom))
+    if cells and cells["shape"] == shape and idf.index.is_unique:
+        nearest = min(cells["zooms"], key=lambda level: abs(level - zoom))
+        codes, lat, lon = cells["zooms"][nearest]
+        if fdf is not idf:
+            codes = codes[idf.index.get_indexer(fdf.index)]
+    else:
+        codes, lat, lon = datautil.bin_points(
+            fdf["latitude"], fdf["longitude"], zoom, shape=shape
+        )
+    cdf = pd.DataFrame({"latitude": lat, "longitude": lon})
+    cdf["count"] = np.bincount(codes, minlength=len(cdf))
+    if z_column:
+        weights = np.nan_to_num(fdf[z_column].to_numpy(dtype="float64"))
+        cdf[z_column] = np.bincount(codes, weights=weights, minlength=len(cdf))
+    return cdf[cdf["count"] > 0].reset_index(drop=True)
+
+
+# Binary array dtypes plotly.js reads natively (it has no 64-bit integers)
+typed_array_dtypes = {
+    "int8": "i1",
+    "uint8": "u1",
+    "int16": "i2",
+    "uint16": "u2",
+    "int32": "i4",
+    "uint32": "u4",
+    "float32": "f4",
+    "float64": "f8",
+}
+
+
+def histogram_edges(values, bins=None, width=None, log=False):
+    """Bin edges covering the values, by a bin count, a bin width, or automatically
+
+    Log bins are evenly spaced in magnitude and only cover the positive values.
+    """
+    values = np.asarray(values, dtype="float64")
+    values = values[np.isfinite(values)]
+    if log:
+        values = values[values > 0]
+    if not len(values):
+        return np.array([0.0, 1.0])
+    low, high = values.min(), values.max()
+    if log:
+        if high <= low:
+            return np.array([low / 2, low * 2])
+        count = bins or len(np.histogram_bin_edges(np.log10(values), "auto")) - 1
+        edges = np.logspace(np.log10(low), np.log10(high), count + 1)
+        # Round-off can leave the outer edges just inside the values
+        edges[0], edges[-1] = low, high
+        return edges
+    if width and high > low:
+        start = np.floor(low / width) * width
+        return start + width * np.arange(np.floor((high - start) / width) + 2)
+    return np.histogram_bin_edges(values, bins or "auto")
+
+
+# Graph inputs that change only how traces are drawn, by their path in a trace
+trace_style_inputs = {
+    "opacity": ("opacity",),
+    "line_width": ("line", "width"),
+    "marker_size": ("marker", "size"),
+    "marker_line_width": ("marker", "line", "width"),
+}
+scale_inputs = ("x_scale", "y_scale")
+
+
+def triggered_inputs(triggered):
+    """Names of the inputs that triggered a callback, as keyed in its inputs"""
+    return {item["prop_id"].split("|")[-1].split(".")[0] for item in triggered}
+
+
+def presentation_only(triggered):
+    """Whether a callback was triggered only by inputs that don't affect the data"""
+    names = triggered_inputs(triggered)
+    return bool(names) and names <= {*trace_style_inputs, *scale_inputs}
+
+
+def trace_count(filters):
+    """The number of traces prepare_traces makes for the filters"""
+    return len(trace_specs(filters))
+
+
+def restyle_patch(inputs, filters):
+    """Updates the presentation of a normal graph in place, leaving its data alone"""
+    patch = dash.Patch()
+    y_column = inputs.get("y_column")
+    y_columns = y_column if isinstance(y_column, list) else [y_column]
+
+    if inputs.get("variant", "scatter") == "scatter":
+        for idx in range(trace_count(filters) * len(y_columns)):
+            for name, path in trace_style_inputs.items():
+                if name in inputs:
+                    target = functools.reduce(
+                        lambda node, key: node[key], path[:-1], patch["data"][idx]
+                    )
+                    target[path[-1]] = inputs[name]
+
+    if "x_scale" in inputs:
+        patch["layout"]["xaxis"]["type"] = inputs["x_scale"]
+    if "y_scale" in inputs:
+        patch["layout"]["yaxis"]["type"] = inputs["y_scale"]
+        for y_idx in range(2, len(y_columns) + 1):
+            patch["layout"][f"yaxis{y_idx}"]["type"] = inputs["y_scale"]
+    return patch
+
+
+def _compact_dates(arr):
+    """Writes datetimes as ISO strings, dropping the time of day when always zero"""
+    try:
+        days = np.asarray(arr, dtype="datetime64[ns]")
+    except (TypeError, ValueError):
+        return arr
+    whole_days = (days == days.astype("datetime64[D]")) | np.isnat(days)
+    unit = "D" if whole_days.all() else "s"
+    return np.where(np.isnat(days), None, np.datetime_as_string(days, unit=unit))
+
+
+def _compact_array(arr, digits=None, typed=False):
+    if arr.dtype.kind == "M" or (
+        arr.dtype.kind == "O" and len(arr) and isinstance(arr[0], dt.datetime)
+    ):
+        return _compact_dates(arr)
+    if arr.dtype.kind == "f" and digits is not None:
+        arr = arr.round(digits)
+    if not typed or arr.ndim != 1:
+        return arr
+    if arr.dtype.kind in "iu" and arr.dtype.itemsize == 8:
+        narrow = np.int32 if arr.dtype.kind == "i" else np.uint32
+        fits = not len(arr) or np.iinfo(narrow).min <= arr.min() <= arr.max()
+        fits = fits and (not len(arr) or arr.max() <= np.iinfo(narrow).max)
+        arr = arr.astype(narrow if fits else np.float64)
+    code = typed_array_dtypes.get(arr.dtype.name)
+    if code is None:
+        return arr
+    data = arr.astype(arr.dtype.newbyteorder("<")).tobytes()
+    return {"dtype": code, "bdata": base64.b64encode(data).decode("ascii")}
+
+
+def compact_figure(figure, precision=None, typed_arrays=False):
+    """Converts a figure to a dict that is quicker to encode and smaller to send
+
+    Dates are written without a time of day when it is always midnight. Float arrays
+    are rounded to the decimal digits given per trace attribute in precision, e.g.
+    {"x": 2, "marker.color": 1}. With typed_arrays, numeric arrays are sent as base64
+    binary, which plotly.js 2.28 and later decodes natively.
+    """
+    precision = precision or {}
+    fig_dict = figure.to_plotly_json()
+
+    def compact(node, path):
+        for key, value in node.items():
+            name = f"{path}{key}"
+            if isinstance(value, dict):
+                compact(value, f"{name}.")
+            elif isinstance(value, np.ndarray) and value.dtype.kind in "iufMO":
+                node[key] = _compact_array(value, precision.get(name), typed_arrays)
+
+    for trace in fig_dict["data"]:
+        compact(trace, "")
+    return fig_dict
+
+
 # @logutil.loginfo(level="debug")
-def aggregate(idf, y_column=None, filters=None, logic="sum", keys=None, **kwargs):
+def aggregate(
+    idf,
+    y_column=None,
+    filters=None,
+    logic="sum",
+    keys=None,
+    index=None,
+    cube=None,
+    **kwargs,
+):
     filters = filters or {}
     filters.update(kwargs.get("fixed_filters", {}))
     # TODO Plenty of work to do cleaning up the data processing utilities like this
     keys = keys or ["date"]
-    traces = prepare_traces(idf, filters, keys)
+    traces = prepare_traces(idf, filters, keys, index=index, cube=cube)
     agg_df = pd.concat(traces)
 
     # NOTE Pay attention to this block for multi-axis support
@@ -277,16 +856,58 @@ def gen_options(option_input, default=None):
         if "value" in option_input:
             return option_input
         option_list = option_input["options"]
-        default = (
-            default
-            if default is not None
-            else option_input.get("default", option_list[0])
-        )
+        if default is None:
+            default = option_input.get("default")
+        if default is None:
+            default = option_list[0]
     # TODO Can we determine when we should run desnake on the entries?
     options = [{"label": desnake(item).title(), "value": item} for item in option_list]
     return {"options": options, "value": default}
 
 
+def column_stats(data, column):
+    """Statistics of a dataset column, from the catalog made at load if there is one"""
+    stats = data.get("stats") or {}
+    if column in stats:
+        return stats[column]
+    return datautil.column_stats(data["df"][column])
+
+
+def column_values(data, column):
+    """The sorted distinct values of a dataset column"""
+    values = column_stats(data, column)["values"]
+    if values is None:
+        values = np.sort(pd.unique(data["df"][column].dropna()))
+    return values
+
+
+def selection_options(data, column, inputs, limit=None):
+    """Options for a selector dropdown, given the current selections of the selector
+
+    Values are narrowed to those found alongside the selections on the other keys,
+    and with a limit, to the top matches of the search text. The values already
+    selected for the column always stay listed.
+    """
+    selections = dictutil.extract(r"_filter\.value$", inputs, pop=False)
+    selections = {key.split("_filter.")[0]: val for key, val in selections.items()}
+    selected = selections.get(column) or []
+    selected = selected if isinstance(selected, list) else [selected]
+
+    combos = data.get("combos")
+    allowed = None
+    if combos and column in combos["columns"]:
+        allowed = datautil.cooccurring(combos, column, selections)
+    if limit is None:
+        found = allowed if allowed is not None else list(combos["labels"][column])
+    else:
+        text = inputs.get(f"{column}_filter.search_value")
+        if allowed is None:
+            found = datautil.search(data["search"][column], text, limit=limit)
+        else:
+            found = datautil.search_values(allowed, text, limit=limit)
+    return gen_options(list(dict.fromkeys([*selected, *found])), [])["options"]
+
+
 def get_first_numeric(data_types):
     for dtype in data_types:
         if "log" in data_types[dtype]: